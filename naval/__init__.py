@@ -95,5 +95,47 @@ Supply a ``lang`` keyword argument to the ``validate`` method to obtain translat
 __author__ = "Benjamin Le Forestier (benjamin@leforestier.org)"
 __version__ = '1.1.0'
 
+import sys
+from naval import core
 from naval.core import *
-from naval.util import Email, Domain, Url
+from naval.core import settings
+
+# The objects imported from these modules on first use, so that `import naval` stays fast:
+# naval.util imports the validators library.
+_LAZY_ATTRIBUTES = {
+    'Email': 'naval.util',
+    'Domain': 'naval.util',
+    'Url': 'naval.util',
+    'CachedEmail': 'naval.util',
+    'CachedDomain': 'naval.util',
+    'CachedUrl': 'naval.util',
+    'instrument': 'naval.profiling'
+}
+
+# The validators of naval.util are part of __all__ on purpose: `from naval import *` has always
+# given Email, Domain and Url, and the examples rely on it. The price is that a star import loads
+# naval.util at once (not the validators library, imported on the first validation).
+# `import naval` and `from naval import Schema` stay fast.
+# `settings` and `instrument` are left out, so that a star import doesn't shadow a `settings`
+# module of the caller: use them as `naval.settings` and `naval.instrument`.
+# str: on python 2, a star import from a package refuses unicode names
+__all__ = [str(name) for name in core.__all__ + sorted(
+    name for name, module in _LAZY_ATTRIBUTES.items() if module == 'naval.util'
+)]
+
+if sys.version_info < (3, 7): # no module level __getattr__
+    from naval.util import Email, Domain, Url, CachedEmail, CachedDomain, CachedUrl
+    from naval.profiling import instrument
+else:
+    def __getattr__(name):
+        try:
+            module = _LAZY_ATTRIBUTES[name]
+        except KeyError:
+            raise AttributeError("module 'naval' has no attribute %r" % name)
+        import importlib
+        value = getattr(importlib.import_module(module), name)
+        globals()[name] = value # __getattr__ isn't called again for this name
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
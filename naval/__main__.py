@@ -0,0 +1,71 @@
+"""
+Command line interface: validates JSON Lines files against a schema.
+
+    $ python -m naval myapp.schemas:user_schema users.jsonl -o valid.jsonl -e errors.jsonl
+
+See `naval.stream` for details. The exit status is 0 if every record is valid, 1 otherwise.
+"""
+
+from __future__ import unicode_literals
+import argparse, io, sys
+from naval.stream import BUFFER_SIZE, load_schema, open_input, validate_stream
+
+def _open_output(path):
+    if path is None:
+        return None
+    if path == '-':
+        return sys.stdout
+    return io.open(path, 'w', encoding = 'utf-8', buffering = BUFFER_SIZE)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(
+        prog = 'python -m naval',
+        description = "Validate JSON Lines (NDJSON) files against a naval schema."
+    )
+    parser.add_argument(
+        'schema', help = "location of the schema, like 'package.module:name'"
+    )
+    parser.add_argument(
+        'inputs', nargs = '*', default = ['-'],
+        help = "files to validate (default: standard input)"
+    )
+    parser.add_argument(
+        '-o', '--valid', default = None, metavar = 'FILE',
+        help = "where to write the validated records ('-' for standard output)"
+    )
+    parser.add_argument(
+        '-e', '--errors', default = '-', metavar = 'FILE',
+        help = "where to write the errors (default: standard output)"
+    )
+    parser.add_argument('-l', '--lang', default = None, help = "language of the error messages")
+    parser.add_argument(
+        '-q', '--quiet', action = 'store_true', help = "don't report statistics on standard error"
+    )
+    args = parser.parse_args(argv)
+
+    schema = load_schema(args.schema)
+    valid = _open_output(args.valid)
+    errors = _open_output(args.errors)
+    invalid = 0
+    try:
+        for path in args.inputs:
+            if path == '-':
+                infile = getattr(sys.stdin, 'buffer', sys.stdin)
+            else:
+                infile = open_input(path)
+            try:
+                stats = validate_stream(schema, infile, valid, errors, args.lang)
+            finally:
+                if infile is not getattr(sys.stdin, 'buffer', sys.stdin):
+                    infile.close()
+            invalid += stats.invalid
+            if not args.quiet:
+                sys.stderr.write('%s: %s\n' % (path, stats))
+    finally:
+        for output in (valid, errors):
+            if output is not None and output is not sys.stdout:
+                output.close()
+    return 1 if invalid else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
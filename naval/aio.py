@@ -0,0 +1,325 @@
+"""
+asyncio support: filters awaiting coroutines, and asynchronous validation.
+
+`AsyncApply` and `AsyncAssert` work like `Apply` and `Assert`, but take coroutine functions.
+Schemas using them must be validated with `Schema.validate_async` (or with the
+`validate_async` function of this module, for other filters):
+
+    >>> async def username_is_free(username):
+            return not await db.users.exists(username = username)
+
+    >>> registration_form = Schema(
+            ['username', Type(str), AsyncAssert(username_is_free, "This username is taken.")],
+            ['email', Email, AsyncAssert(email_is_free, "This email is already registered.")],
+            max_concurrency = 10
+        )
+
+    >>> await registration_form.validate_async({'username': 'TheKing', 'email': 'king@example.com'})
+
+Inside a schema, consecutive chains working on different fields have their filters run
+concurrently (with `asyncio.gather`). A chain waits for the preceding chains when:
+    - it has no field (it works on the whole dictionary, and only runs if there's no error yet),
+    - it has a `Default` computed by a function (it's passed the whole dictionary),
+    - its field is written by a preceding chain (with `Save`, `SaveAs`, `MoveTo` or `Delete`).
+So the result is always the same as if the chains were run one after another.
+The elements of a collection validated with `Each` are checked concurrently too.
+In fail fast mode, the chains run one after another, so that the validation stops at the
+same error as with `validate`.
+The other options of the schemas (`cache`, `read_only`, `fail_fast`...) work just like with
+`validate`, except `profile`: the schemas containing asynchronous filters aren't profiled.
+
+The `max_concurrency` argument of `Schema` limits the number of asynchronous filters awaited
+at the same time during one validation. This includes the filters of the nested schemas
+and of the elements checked with `Each`. A nested schema can have its own `max_concurrency`,
+that applies to each validation of that schema, in addition to the limits of the enclosing schemas.
+"""
+
+import asyncio, weakref
+from naval.core import (
+    Apply, Assert, Cached, DefaultFunc, Delete, Do, Each, ErrorRecord, Filter, MoveTo, Save, SaveAs,
+    Schema, ValidationError, settings, _DICT_TYPE, _SKIP, _fail_fast
+)
+
+__all__ = ['AsyncApply', 'AsyncAssert', 'AsyncFilter', 'check_async', 'validate_async']
+
+
+class AsyncFilter(Filter):
+    """
+    Base class for the filters that need to await something.
+    The subclasses override the `check_async` coroutine method, which returns a pair
+     `(ok, result)` just like `Filter.check`.
+    """
+
+    def check(self, value):
+        raise TypeError(
+            "%s is asynchronous, use validate_async instead of validate." % type(self).__name__
+        )
+
+    async def check_async(self, value):
+        raise NotImplementedError
+
+class AsyncApply(AsyncFilter, Apply):
+    """
+    Same as `Apply`, for a coroutine function.
+
+        >>> geocode = AsyncApply(geocoder.lookup, error_message = "Unknown address.")
+    """
+
+    async def check_async(self, value):
+        try:
+            return True, await self.unary_function(value)
+        except self.catch as exc:
+            if self.error_message:
+                return False, ErrorRecord(self.code, self.error_message)
+            else:
+                return False, ErrorRecord(self.code, str(exc))
+        except ValidationError as exc: # when `catch` doesn't include it
+            return False, exc.error_details
+
+class AsyncAssert(AsyncFilter, Assert):
+    """
+    Same as `Assert`, for a coroutine function.
+    """
+
+    async def check_async(self, value):
+        try:
+            if await self.unary_test(value):
+                return True, value
+        except ValidationError as exc:
+            return False, exc.error_details
+        return False, ErrorRecord(self.code, self.error_message)
+
+
+class _NoLimit(object):
+    async def __aenter__(self):
+        pass
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+class _NestedLimit(object):
+    """
+    Limit of a schema with a `max_concurrency`, nested in another validation:
+    the filters wait for the semaphore of the schema, then for the limit of the enclosing validation.
+    """
+
+    def __init__(self, semaphore, outer):
+        self.semaphore = semaphore
+        self.outer = outer
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        try:
+            await self.outer.__aenter__()
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+    async def __aexit__(self, *exc_info):
+        try:
+            await self.outer.__aexit__(*exc_info)
+        finally:
+            self.semaphore.release()
+
+def _schema_limit(schema, limit):
+    if not schema.max_concurrency:
+        return limit
+    semaphore = asyncio.Semaphore(schema.max_concurrency)
+    if isinstance(limit, _NoLimit):
+        return semaphore
+    return _NestedLimit(semaphore, limit)
+
+_is_async_cache = weakref.WeakKeyDictionary()
+
+def _is_async(filtr):
+    """
+    Tells whether `filtr` contains asynchronous filters.
+    """
+    try:
+        return _is_async_cache[filtr]
+    except KeyError:
+        pass
+    if isinstance(filtr, AsyncFilter):
+        result = True
+    elif isinstance(filtr, Schema):
+        result = any(_is_async(f) for chain in filtr.chains for f in chain.filters)
+    elif isinstance(filtr, Do):
+        result = any(_is_async(f) for f in filtr._filters)
+    elif isinstance(filtr, (Each, Cached)):
+        result = _is_async(filtr._filter)
+    else:
+        result = False
+    _is_async_cache[filtr] = result
+    return result
+
+async def _check(filtr, value, limit):
+    if not _is_async(filtr):
+        return filtr.check(value)
+    if isinstance(filtr, AsyncFilter):
+        async with limit:
+            return await filtr.check_async(value)
+    if isinstance(filtr, Schema):
+        return await _check_schema(filtr, value, _schema_limit(filtr, limit))
+    if isinstance(filtr, Do):
+        ok, value = await _check_filters(filtr._filters, value, limit)
+        if not ok:
+            if filtr.error_message:
+                return False, ErrorRecord(filtr.code, filtr.error_message)
+            return False, value
+        return True, value
+    if isinstance(filtr, Cached):
+        key = filtr._key(value)
+        if key is None:
+            return await _check(filtr._filter, value, limit)
+        result = filtr._cache.get(key, Cached._NOT_FOUND)
+        if result is Cached._NOT_FOUND:
+            result = await _check(filtr._filter, value, limit)
+            filtr._cache.set(key, result)
+        return result
+    if isinstance(filtr, Each):
+        return await _check_each(filtr, value, limit)
+    raise TypeError("Don't know how to run %r asynchronously." % filtr)
+
+async def _check_each(filtr, value, limit):
+    # like `_check_items`: the results are collected in the order of the items, and the items
+    # still running are cancelled once the invalid ones exceed the error budget
+    tasks = [asyncio.ensure_future(_check(filtr._filter, val, limit)) for val in value]
+    try:
+        budget = filtr._error_budget()
+        result, errors = [], []
+        for i, task in enumerate(tasks):
+            ok, val = await task
+            if not ok:
+                errors.append((i, val))
+                if len(errors) >= budget:
+                    break
+            result.append(val)
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions = True)
+    if errors:
+        return False, filtr._item_errors(errors)
+    if isinstance(value, (tuple, set)):
+        result = type(value)(result)
+    return True, result
+
+async def _check_filters(filters, value, limit):
+    for f in filters:
+        ok, value = await _check(f, value, limit)
+        if not ok:
+            return False, value
+    return True, value
+
+def _written_keys(chain):
+    """
+    Returns the keys written by the storage instruction of a chain,
+    or None if they're unknown.
+    """
+    storage = chain.storage_instruction
+    if not storage:
+        return ()
+    elif storage is Save or storage is Delete:
+        return (chain.field[0],)
+    elif type(storage) is SaveAs:
+        return (storage.name,)
+    elif type(storage) is MoveTo:
+        return (storage.name, chain.field[0])
+    return None
+
+def _groups(chains):
+    """
+    Splits the chains of a schema in groups of chains that can run concurrently.
+    """
+    group, written = [], set()
+    for chain in chains:
+        if (
+            group and (
+                not chain.field
+                or isinstance(chain.default, DefaultFunc)
+                or chain.field[0] in written
+            )
+        ):
+            yield group
+            group, written = [], set()
+        group.append(chain)
+        keys = _written_keys(chain) if chain.field else None
+        if keys is None:
+            yield group
+            group, written = [], set()
+        else:
+            written.update(keys)
+    if group:
+        yield group
+
+async def _check_schema(schema, dict_, limit):
+    # same steps as Schema.check
+    key = schema._cache_key(dict_) if schema._cache is not None else None
+    if key is None:
+        return await _check_chains(schema, dict_, limit)
+    result = schema._cache.get(key)
+    if result is None:
+        ok, value = await _check_chains(schema, dict_, limit)
+        result = schema._cache_result(key, dict_, ok, value)
+    return schema._cached_result(result)
+
+async def _check_chains(schema, dict_, limit):
+    # same steps as Schema._check, with the filters of each group of chains run concurrently
+    fail_fast = _fail_fast.get()
+    if schema.fail_fast and not fail_fast:
+        token = _fail_fast.set(True)
+        try:
+            return await _check_chains(schema, dict_, limit)
+        finally:
+            _fail_fast.reset(token)
+    ok, details = _DICT_TYPE.check(dict_)
+    if not ok:
+        return False, details
+    errors = {}
+    dct = schema._expected_keys(dict_, errors, fail_fast)
+    if fail_fast and errors:
+        return False, errors
+
+    # in fail fast mode, the chains run one after another, to stop at the same error as `validate`
+    groups = ([chain] for chain in schema.chains) if fail_fast else _groups(schema.chains)
+    for group in groups:
+        values, missing = [], []
+        for chain in group:
+            # the missing fields are recorded with the results, to keep the order of the chains.
+            # Only the first chain of a group looks at the errors (see `_groups`).
+            chain_errors = errors if not values else {}
+            dct, value = schema._chain_value(chain, dict_, dct, chain_errors)
+            values.append(value)
+            missing.append(chain_errors)
+        results = iter(await asyncio.gather(*(
+            _check_filters(chain.filters, value, limit)
+            for chain, value in zip(group, values)
+            if value is not _SKIP
+        )))
+        for chain, value, chain_errors in zip(group, values, missing):
+            if chain_errors is not errors:
+                errors.update(chain_errors)
+            if value is not _SKIP:
+                ok, value = next(results)
+                dct = schema._chain_result(chain, dict_, dct, errors, ok, value)
+        if fail_fast and errors:
+            break
+
+    return schema._check_result(dict_, dct, errors)
+
+async def check_async(filtr, value):
+    """
+    Coroutine version of `filtr.check(value)`, that can run asynchronous filters.
+    """
+    return await _check(filtr, value, _NoLimit())
+
+async def validate_async(filtr, value, lang = None):
+    """
+    Coroutine version of `filtr.validate(value, lang)`, that can run asynchronous filters.
+    """
+    ok, result = await check_async(filtr, value)
+    if ok:
+        return result
+    raise ValidationError(result, settings.translator(lang))
@@ -0,0 +1,140 @@
+"""
+Benchmarks of naval, to detect performance regressions.
+
+    $ python -m naval.bench run -o before.json
+    ... (modify naval)
+    $ python -m naval.bench run -o after.json
+    $ python -m naval.bench compare before.json after.json
+
+For every workload (see `naval.bench.workloads`), the following is measured:
+    - the number of operations per second,
+    - the median (p50) and 99th percentile (p99) latency of an operation, in microseconds,
+    - the memory allocated during an operation, in bytes (the peak measured by `tracemalloc`,
+      in a separate run, since tracing allocations slows everything down).
+
+`compare` flags the workloads whose number of operations per second decreased by more than
+a threshold (10% by default).
+"""
+
+from __future__ import unicode_literals, division
+import io, json, platform, time
+from naval.bench.workloads import WORKLOADS
+
+try:
+    import tracemalloc
+except ImportError: # python 2
+    tracemalloc = None
+
+__all__ = ['compare', 'format_stats', 'load_results', 'measure', 'run', 'save_results']
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+def _percentile(sorted_values, fraction):
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def _allocated(operation, runs = 3):
+    if tracemalloc is None:
+        return None
+    operation() # warm up the caches, so they're not counted
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(runs):
+            tracemalloc.clear_traces()
+            start, _peak = tracemalloc.get_traced_memory()
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            operation()
+            _current, peak = tracemalloc.get_traced_memory()
+            total += peak - start
+    finally:
+        tracemalloc.stop()
+    return total // runs
+
+def measure(operation, duration = 1.0, min_runs = 5):
+    """
+    Calls `operation` repeatedly, during at least `duration` seconds and at least `min_runs`
+    times. Returns a dictionary of statistics.
+    """
+    operation() # warm up
+    latencies = []
+    clock = _clock
+    start = clock()
+    end = start + duration
+    while True:
+        before = clock()
+        operation()
+        after = clock()
+        latencies.append(after - before)
+        if after >= end and len(latencies) >= min_runs:
+            break
+    latencies.sort()
+    elapsed = sum(latencies)
+    return {
+        'runs': len(latencies),
+        'ops_per_sec': len(latencies) / elapsed if elapsed else float('inf'),
+        'p50_us': _percentile(latencies, 0.5) * 1e6,
+        'p99_us': _percentile(latencies, 0.99) * 1e6,
+        'allocated_bytes': _allocated(operation)
+    }
+
+def run(names = None, duration = 1.0, report = None):
+    """
+    Runs the workloads named in `names` (all of them by default).
+    `report` is called with the name and the statistics of each workload, once measured.
+    Returns the results, as a dictionary that can be saved to a JSON file.
+    """
+    names = list(names or WORKLOADS)
+    for name in names:
+        if name not in WORKLOADS:
+            raise ValueError(
+                "Unknown workload %r. Available workloads: %s." % (name, ', '.join(WORKLOADS))
+            )
+    import naval
+    results = {
+        'naval': naval.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'workloads': {}
+    }
+    for name in names:
+        stats = measure(WORKLOADS[name](), duration)
+        results['workloads'][name] = stats
+        if report is not None:
+            report(name, stats)
+    return results
+
+def save_results(results, path):
+    with io.open(path, 'w', encoding = 'utf-8') as fd:
+        fd.write(json.dumps(results, indent = 2, sort_keys = True, ensure_ascii = False))
+
+def load_results(path):
+    with io.open(path, encoding = 'utf-8') as fd:
+        return json.load(fd)
+
+def compare(old, new, threshold = 0.1):
+    """
+    Compares two results of `run`, workload by workload.
+    Returns a list of `(name, old_ops_per_sec, new_ops_per_sec, change, regression)` tuples,
+    `change` being the relative change of the number of operations per second, and `regression`
+    telling whether it decreased by more than `threshold`.
+    Only the workloads present in both results are compared.
+    """
+    comparison = []
+    for name, new_stats in sorted(new['workloads'].items()):
+        old_stats = old['workloads'].get(name)
+        if old_stats is None:
+            continue
+        before, after = old_stats['ops_per_sec'], new_stats['ops_per_sec']
+        change = (after - before) / before if before else 0.0
+        comparison.append((name, before, after, change, change < -threshold))
+    return comparison
+
+def format_stats(name, stats):
+    allocated = stats['allocated_bytes']
+    return '%-12s %12.1f ops/s   p50 %10.1f us   p99 %10.1f us   %s' % (
+        name, stats['ops_per_sec'], stats['p50_us'], stats['p99_us'],
+        '%d bytes allocated' % allocated if allocated is not None else ''
+    )
@@ -0,0 +1,64 @@
+"""
+Command line interface of the benchmarks. See `naval.bench`.
+
+    $ python -m naval.bench run -o results.json
+    $ python -m naval.bench compare before.json after.json
+"""
+
+from __future__ import unicode_literals
+import argparse, sys
+from naval.bench import compare, format_stats, load_results, run, save_results
+from naval.bench.workloads import WORKLOADS
+
+def _print(line):
+    sys.stdout.write(line + '\n')
+    sys.stdout.flush()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = 'python -m naval.bench', description = "Benchmarks of naval.")
+    commands = parser.add_subparsers(dest = 'command')
+
+    run_parser = commands.add_parser('run', help = "run the benchmarks")
+    run_parser.add_argument(
+        'workloads', nargs = '*', metavar = 'WORKLOAD',
+        help = "workloads to run (default: all of them): %s" % ', '.join(WORKLOADS)
+    )
+    run_parser.add_argument(
+        '-t', '--time', type = float, default = 1.0,
+        help = "duration of the measure of each workload, in seconds (default: 1)"
+    )
+    run_parser.add_argument('-o', '--output', metavar = 'FILE', help = "save the results to a JSON file")
+
+    compare_parser = commands.add_parser(
+        'compare', help = "compare two results files, and flag the regressions"
+    )
+    compare_parser.add_argument('old', help = "results of the reference run")
+    compare_parser.add_argument('new', help = "results of the new run")
+    compare_parser.add_argument(
+        '--threshold', type = float, default = 0.1,
+        help = "relative slowdown regarded as a regression (default: 0.1, that is 10%%)"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+
+    if args.command == 'compare':
+        regressions = 0
+        for name, before, after, change, regression in compare(
+            load_results(args.old), load_results(args.new), args.threshold
+        ):
+            regressions += regression
+            _print('%-12s %12.1f -> %12.1f ops/s  %+7.1f%%%s' % (
+                name, before, after, change * 100, '  REGRESSION' if regression else ''
+            ))
+        return 1 if regressions else 0
+
+    results = run(args.workloads, args.time, report = lambda name, stats: _print(format_stats(name, stats)))
+    if args.output:
+        save_results(results, args.output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+The workloads measured by `naval.bench`.
+
+Each workload is a function taking no argument, that returns a function doing one operation
+(usually one call to `validate`). The data is built beforehand, so that only the validation
+is measured.
+"""
+
+from __future__ import unicode_literals
+import collections, os, subprocess, sys
+from naval import *
+from naval import compiler, spec
+
+def _validate_or_fail(schema, value, lang = None):
+    def operation():
+        try:
+            schema.validate(value, lang)
+        except ValidationError:
+            pass
+    return operation
+
+_address_schema = Schema(
+    ['house number', Type(int), Range(1, 10000)],
+    ['street', Type(str), Length(min=5, max=255)],
+    ['zipcode', Type(str), Regex(r'\d{4,5}')],
+    ['city', Type(str), Length(max=100), str.title, Save],
+    ['country', ('France', 'Germany', 'Spain')],
+    ['floor', Optional, Type(int)],
+    ['notes', Discard(''), Default(''), Type(str)]
+)
+
+_valid_address = {
+    'house number': 12,
+    'street': 'tapioca boulevard',
+    'zipcode': '75011',
+    'city': 'paris',
+    'country': 'France',
+    'notes': ''
+}
+
+_invalid_addresses = [
+    {'house number': 12000, 'street': 'tapioca boulevard', 'country': 'Portulombia'},
+    {'house number': '12', 'street': 'st', 'zipcode': 'abc', 'city': 3, 'country': 'France'},
+    {'street': 'tapioca boulevard', 'zipcode': '75011', 'unknown': True},
+    'not even a dictionary'
+]
+
+def flat():
+    "A schema of 7 chains, validating a valid dictionary."
+    return _validate_or_fail(_address_schema, _valid_address)
+
+def nested(depth = 8):
+    "Schemas nested 8 levels deep."
+    schema = _address_schema
+    value = _valid_address
+    for level in range(depth):
+        schema = Schema(
+            ['level', Type(int)],
+            ['name', Type(str), Length(max=30)],
+            ['child', schema]
+        )
+        value = {'level': level, 'name': 'level %d' % level, 'child': value}
+    return _validate_or_fail(schema, value)
+
+def each_10k():
+    "Each applied to a list of 10000 integers."
+    schema = Schema(['values', Type(list), Each(Do(Type(int), Range(0, 1000000)))])
+    value = {'values': list(range(10000))}
+    return _validate_or_fail(schema, value)
+
+def errors():
+    "A mix of valid and invalid dictionaries, 4 out of 5 being invalid."
+    operations = [
+        _validate_or_fail(_address_schema, value)
+        for value in [_valid_address] + _invalid_addresses
+    ]
+    def operation():
+        for op in operations:
+            op()
+    return operation
+
+def errors_fr():
+    "The same mix of dictionaries as 'errors', with the error messages translated in French."
+    operations = [
+        _validate_or_fail(_address_schema, value, 'fr')
+        for value in [_valid_address] + _invalid_addresses
+    ]
+    def operation():
+        for op in operations:
+            op()
+    return operation
+
+def each_errors():
+    "Each collecting the errors of a list of 10000 values, 1000 of them being invalid."
+    schema = Schema(
+        ['values', Type(list), Each(Do(Type(int), Range(0, 1000000)), collect_errors = True, max_errors = 1000)]
+    )
+    value = {'values': [i if i % 10 else -i - 1 for i in range(10000)]}
+    return _validate_or_fail(schema, value)
+
+def email_url():
+    "Email and Url heavy dictionaries, valid and invalid."
+    schema = Schema(
+        ['email', Email],
+        ['website', Url],
+        ['links', Type(list), Each(Url)]
+    )
+    values = [
+        {
+            'email': 'the-king@example.com',
+            'website': 'https://www.example.com/about/team?lang=en',
+            'links': ['http://example.org/a', 'https://blog.example.net/2017/07/naval', 'ftp://10.1.2.3/f']
+        },
+        {
+            'email': '@@@@@@@@',
+            'website': 'http://#',
+            # Url used to be a regex, that took about 1 ms to reject this link, and twice as
+            # long with every additional letter
+            'links': ['http://' + 'a' * 12 + '.' * 5]
+        }
+    ]
+    operations = [_validate_or_fail(schema, value) for value in values]
+    def operation():
+        for op in operations:
+            op()
+    return operation
+
+def url_worst():
+    "Url rejecting links of about 2000 characters, crafted to be slow to parse."
+    links = [
+        'http://' + 'a' * 2000 + '.' * 76,
+        'http://' + 'a-' * 1030 + '.c',
+        'http://' + 'a.' * 1035 + '1',
+        'http://' + 'a@' * 1035,
+        'http://' + '@:' * 1030,
+        'http://' + 'a@a.co:' * 296,
+        'http://' + '1.' * 1035 + '1'
+    ]
+    schema = Schema(['link', Url])
+    operations = [_validate_or_fail(schema, {'link': link}) for link in links]
+    def operation():
+        for op in operations:
+            op()
+    return operation
+
+def _build_address_schema():
+    return Schema(
+        ['house number', Type(int), Range(1, 10000)],
+        ['street', Type(str), Length(min=5, max=255)],
+        ['zipcode', Type(str), Regex(r'\d{4,5}')],
+        ['city', Type(str), Length(max=100), str.title, Save],
+        ['country', ('France', 'Germany', 'Spain')],
+        ['floor', Optional, Type(int)],
+        ['notes', Discard(''), Default(''), Type(str)],
+        ['email', Email],
+        ['website', Optional, Url]
+    )
+
+def compiling():
+    "Building and compiling a schema of 9 chains."
+    def operation():
+        compiler.clear_cache() # forget the code loaded by load_compiled
+        _build_address_schema().compile()
+    return operation
+
+def load_compiled():
+    "Loading the same compiled schema from the binary form of naval.spec."
+    data = spec.dumps(_build_address_schema().compile())
+    return lambda: spec.loads(data)
+
+def import_naval():
+    "Starting a new python process that imports naval and validates an integer with Type and Range."
+    command = [
+        sys.executable, '-c',
+        'import naval; naval.Do(naval.Type(int), naval.Range(0, 10)).validate(5)'
+    ]
+    environment = dict(os.environ, PYTHONPATH = os.pathsep.join(sys.path))
+    return lambda: subprocess.check_call(command, env = environment)
+
+WORKLOADS = collections.OrderedDict(
+    (f.__name__, f) for f in (
+        flat, nested, each_10k, errors, errors_fr, each_errors, email_url, url_worst, compiling,
+        load_compiled, import_naval
+    )
+)
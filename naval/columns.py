@@ -0,0 +1,381 @@
+"""
+Columnar validation, backed by NumPy. See `Schema.validate_columns`.
+
+Row number `i` is validated as if it were the dictionary
+`{field: column[i] for field, column in columns.items()}`, the values being python objects
+(`int`, not `numpy.int64`).
+The columns of booleans, integers, floats and strings keep their NumPy dtype, and so do the
+lists of values all of the same of these types. Any other column (dtype `object`, dates,
+values of mixed types, strings ending with a NUL character, that NumPy strings would drop...)
+is converted to an array of python objects.
+Each chain of the schema is applied to a whole column at once:
+    - `Type`, `Range`, `Length`, `In`, `ToInt` and `ToFloat` are evaluated with NumPy operations
+      over the rows that are still valid for this chain: comparisons for `Range`, `np.isin` for
+      `In` on numbers, `np.char.str_len` for `Length`, and just the dtype for `Type`. The values that have
+      to be converted to python objects for that are: the numbers compared to something else
+      than a number, the values of `Regex` (a python function, called for each value), and the
+      values of columns of type `object`.
+      The error messages of the failing rows are then obtained from the filter itself, so they
+      are the same as with `Schema.validate`.
+    - the other filters (`Apply`, `Assert`, nested schemas...) are applied row by row, but only
+      to the rows that are still valid for this chain.
+    - the rules without a field, and the `Default` values computed by a function, need the whole
+      row as a dictionary. They are evaluated row by row.
+"""
+
+from __future__ import unicode_literals
+from past.builtins import long, unicode
+import numpy as np
+from naval.core import (
+    DefaultFunc, Delete, Do, In, Length, MoveTo, Range, Regex, Save, SaveAs, Schema, ToFloat,
+    ToInt, Type, evalr, settings
+)
+
+__all__ = ['validate_columns']
+
+
+# {python type: dtype of the arrays of values of this type}
+_NATIVE_TYPES = {bool: np.bool_, int: np.int64, float: np.float64, unicode: np.str_}
+
+def _map(func, values):
+    return np.frompyfunc(func, 1, 1)(values)
+
+def _native(dtype):
+    """
+    Tells whether the arrays of type `dtype` are kept as they are.
+    """
+    return dtype.kind in 'biuU' or (dtype.kind == 'f' and dtype.itemsize <= 8)
+
+def _python_type(dtype):
+    # the type of the python objects in an array of type `dtype`
+    return type(np.zeros(1, dtype = dtype)[0].item())
+
+def _is_number(value):
+    return isinstance(value, (bool, int, long, float))
+
+def _object_array(column):
+    if isinstance(column, np.ndarray):
+        # astype converts numpy scalars to python objects
+        return column.astype(object)
+    column = list(column)
+    array = np.empty(len(column), dtype = object)
+    for i, value in enumerate(column): # assigning a slice would unpack nested lists
+        array[i] = value
+    return array
+
+def _column_array(column):
+    if isinstance(column, np.ndarray):
+        return column if _native(column.dtype) else column.astype(object)
+    array = _object_array(column)
+    types = set(_map(type, array)) if len(array) else ()
+    if len(types) == 1:
+        dtype = _NATIVE_TYPES.get(types.pop())
+        if dtype is np.str_ and any(s.endswith('\x00') for s in array):
+            dtype = None
+        if dtype is not None:
+            try:
+                return array.astype(dtype)
+            except OverflowError: # integers too big for int64
+                pass
+    return array
+
+def _values(array):
+    # the values of `array` as python objects
+    return array.tolist() if array.dtype != object else list(array)
+
+def _isin(values, collection):
+    """
+    Vectorized `value in collection`.
+    """
+    # not for strings: NumPy would drop the trailing NUL characters of the collection
+    if values.dtype.kind in 'biuf' and isinstance(collection, (list, tuple, set, frozenset)):
+        # `==` between numbers: `True in [1]` is True for NumPy too
+        members = [x for x in collection if _is_number(x)]
+        return np.isin(values, members) if members else np.zeros(len(values), dtype = bool)
+    return _map(lambda value: value in collection, values).astype(bool)
+
+def _flatten(filters):
+    for f in filters:
+        if type(f) is Do and not f.error_message:
+            for sub in _flatten(f._filters):
+                yield sub
+        else:
+            yield f
+
+def _vectorized(f, values):
+    """
+    Returns a boolean array telling which values pass the filter `f`, and the transformed
+    values, or None if `f` can't be evaluated as a NumPy operation.
+    """
+    if values.dtype != object:
+        result = _native_vectorized(f, values)
+        if result is not None:
+            return result
+        values = values.astype(object)
+    cls = type(f)
+    if cls is Type:
+        types = _map(type, values)
+        if f._subclasses:
+            accepted = [t for t in set(types) if issubclass(t, f.types)]
+        else:
+            accepted = f.types
+        ok = np.zeros(len(values), dtype = bool)
+        for t in accepted:
+            ok |= (types == t).astype(bool)
+        return ok, values
+    elif cls is Range:
+        ok = np.ones(len(values), dtype = bool)
+        if f.min is not None:
+            ok &= ~(values < f.min).astype(bool)
+        if f.max is not None:
+            ok &= ~(values > f.max).astype(bool)
+        return ok, values
+    elif cls is Length:
+        lengths = _map(len, values)
+        ok = ~(lengths < f.min).astype(bool)
+        if f.max is not None:
+            ok &= ~(lengths > f.max).astype(bool)
+        return ok, values
+    elif cls is In:
+        return _isin(values, f.collection), values
+    elif cls is Regex:
+        return _map(f.match, values).astype(bool), values
+    elif f is ToInt or f is ToFloat:
+        try:
+            return np.ones(len(values), dtype = bool), _map(f.unary_function, values)
+        except Exception:
+            return None # some rows fail, let the filter tell which ones
+    return None
+
+def _native_vectorized(f, values):
+    """
+    Same as `_vectorized`, for the arrays that aren't of type `object`.
+    """
+    cls = type(f)
+    kind = values.dtype.kind
+    if cls is Type:
+        t = _python_type(values.dtype)
+        accepted = issubclass(t, f.types) if f._subclasses else t in f.types
+        return np.full(len(values), accepted, dtype = bool), values
+    elif cls is Range and kind != 'U':
+        bounds = [bound for bound in (f.min, f.max) if bound is not None]
+        if not all(_is_number(bound) for bound in bounds):
+            return None
+        ok = np.ones(len(values), dtype = bool)
+        # NaN passes, as it does with `Range.run`
+        if f.min is not None:
+            ok &= ~(values < f.min)
+        if f.max is not None:
+            ok &= ~(values > f.max)
+        return ok, values
+    elif cls is Length and kind == 'U':
+        lengths = np.char.str_len(values)
+        ok = lengths >= f.min
+        if f.max is not None:
+            ok &= lengths <= f.max
+        return ok, values
+    elif cls is In:
+        return _isin(values, f.collection), values
+    elif f is ToInt and kind in 'biu':
+        return np.ones(len(values), dtype = bool), values.astype(np.int64) if kind == 'b' else values
+    elif f is ToFloat and kind in 'biuf':
+        return np.ones(len(values), dtype = bool), values.astype(np.float64)
+    return None
+
+class _Columns(object):
+
+    def __init__(self, schema, columns):
+        self.schema = schema
+        self.length = None
+        self.values = {}
+        self.present = {}
+        for field, column in columns.items():
+            array = _column_array(column)
+            if self.length is None:
+                self.length = len(array)
+            elif len(array) != self.length:
+                raise ValueError("All the columns should have the same length.")
+            self.values[field] = array
+            self.present[field] = np.ones(len(array), dtype = bool)
+        if self.length is None:
+            self.length = 0
+        self.errors = {}
+
+    def add_errors(self, rows, key, details):
+        errors = self.errors
+        for row in rows:
+            errors.setdefault(int(row), {})[key] = details
+
+    def column(self, field):
+        if field not in self.values:
+            self.values[field] = np.empty(self.length, dtype = object)
+            self.present[field] = np.zeros(self.length, dtype = bool)
+        return self.values[field], self.present[field]
+
+    def assign(self, field, rows, result):
+        """
+        Sets the values of `field` for the rows `rows` (an array of row numbers, or a single
+        row number), and marks them as present.
+        The column becomes an array of python objects, unless `result` is an array of the
+        same type as the column.
+        """
+        values, present = self.column(field)
+        if values.dtype != object and (
+            not isinstance(result, np.ndarray) or result.dtype != values.dtype
+        ):
+            values = self.values[field] = values.astype(object)
+        values[rows] = result
+        present[rows] = True
+
+    def row(self, row):
+        return dict(
+            (field, values[row:row + 1].tolist()[0])
+            for field, values in self.values.items()
+            if self.present[field][row]
+        )
+
+    def store_row(self, row, dct):
+        for field in list(self.present):
+            self.present[field][row] = False
+        for field, value in dct.items():
+            self.assign(field, row, value)
+
+    def rows_without_errors(self):
+        ok = np.ones(self.length, dtype = bool)
+        ok[list(self.errors)] = False
+        return np.flatnonzero(ok)
+
+    def unexpected_keys(self):
+        schema = self.schema
+        policy = schema.unexpected_keys_policy
+        if policy is Schema.KEEP:
+            return
+        for key in list(self.values):
+            if key not in schema.expected_fields:
+                if policy is Schema.FAIL:
+                    self.add_errors(
+                        np.flatnonzero(self.present[key]),
+                        key,
+                        schema._unexpected_key_error(key)
+                    )
+                del self.values[key]
+                del self.present[key]
+
+    def apply_filters(self, chain, rows, values, error_key):
+        """
+        Applies the filters of `chain` to `values` (the values of the rows `rows`).
+        Returns the rows that passed all the filters, and their transformed values.
+        """
+        storage = chain.storage_instruction
+        for f in _flatten(chain.filters):
+            vectorized = _vectorized(f, values)
+            if vectorized is not None:
+                ok, values = vectorized
+                failed = np.flatnonzero(~ok)
+                details = [f.check(value)[1] for value in _values(values[failed])]
+            else:
+                ok = np.ones(len(values), dtype = bool)
+                results = np.empty(len(values), dtype = object)
+                details = []
+                for i, value in enumerate(_values(values)):
+                    success, result = f.check(value)
+                    if success:
+                        results[i] = result
+                    else:
+                        ok[i] = False
+                        details.append(result)
+                values = results
+                failed = np.flatnonzero(~ok)
+            for row, detail in zip(rows[failed], details):
+                self.add_errors((row,), error_key, detail)
+                if isinstance(storage, (SaveAs, MoveTo)):
+                    self.add_errors((row,), storage.name, self.schema._computation_error)
+            rows, values = rows[ok], values[ok]
+        return rows, values
+
+    def field_chain(self, chain):
+        field = chain.field[0]
+        values, present = self.column(field)
+        if chain.discard:
+            rows = np.flatnonzero(present)
+            discarded = _isin(values[rows], chain.discard)
+            present[rows[discarded]] = False
+        missing = np.flatnonzero(~present)
+        if len(missing) and not chain.optional:
+            if not chain.default:
+                self.add_errors(missing, field, self.schema._missing_field_error)
+            elif isinstance(chain.default, DefaultFunc):
+                for row in missing:
+                    if row not in self.errors: # avoid working with potentially invalid data
+                        self.assign(field, row, chain.default.getvalue(self.row(row)))
+            else:
+                for row in missing:
+                    self.assign(field, row, chain.default.getvalue(None))
+            values = self.values[field]
+
+        rows = np.flatnonzero(present)
+        rows, result = self.apply_filters(chain, rows, values[rows], field)
+
+        storage = chain.storage_instruction
+        if not storage:
+            return
+        if storage is Save:
+            self.assign(field, rows, result)
+        elif type(storage) in (SaveAs, MoveTo):
+            self.assign(storage.name, rows, result)
+            if type(storage) is MoveTo:
+                present[rows] = False
+        elif storage is Delete:
+            present[rows] = False
+        else:
+            for row, value in zip(rows, _values(result)):
+                dct = self.row(row)
+                storage.execute(dct, field, value)
+                self.store_row(row, dct)
+
+    def global_chain(self, chain):
+        storage = chain.storage_instruction
+        for row in self.rows_without_errors():
+            value = dct = self.row(row)
+            for f in chain.filters:
+                ok, value = f.check(value)
+                if not ok:
+                    self.add_errors((row,), '*', value)
+                    if isinstance(storage, SaveAs):
+                        self.add_errors((row,), storage.name, self.schema._computation_error)
+                    break
+            else:
+                if storage is Save:
+                    self.store_row(row, value)
+                elif storage:
+                    storage.execute(dct, None, value)
+                    self.store_row(row, dct)
+
+    def validate(self):
+        self.unexpected_keys()
+        for chain in self.schema.chains:
+            if chain.field:
+                self.field_chain(chain)
+            else:
+                self.global_chain(chain)
+        mask = np.ones(self.length, dtype = bool)
+        mask[list(self.errors)] = False
+        return mask
+
+def validate_columns(schema, columns, lang = None):
+    """
+    Validates the rows of `columns` (a dictionary mapping each field to a sequence of values,
+    all of the same length) against `schema`.
+
+    Returns a pair `(mask, errors)`:
+        `mask` is a NumPy array of booleans, telling which rows are valid.
+        `errors` is a dictionary mapping the number of each invalid row to its error details.
+         These are the same as the error details that `schema.validate` would give for this row.
+    """
+    cols = _Columns(schema, columns)
+    mask = cols.validate()
+    translate_message = settings.translator(lang)
+    errors = dict(
+        (row, evalr(details, translate_message)) for row, details in cols.errors.items()
+    )
+    return mask, errors
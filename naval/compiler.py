@@ -0,0 +1,314 @@
+"""
+Code generation for `Schema.compile`.
+
+`compile_schema` turns the chains of a schema into the source code of a single python
+function, with one block per chain, and executes it. The generated function behaves
+exactly like the interpreted `Schema.check`: it builds the same output dictionary or
+returns the same error details.
+
+The elementary filters `Type`, `Range`, `Length`, `In` and `Regex` are inlined as plain
+comparisons. When an inlined comparison fails, the original filter is checked to produce
+the error message, so the error details are always the ones of the interpreted version.
+Other filters are called through their `check` method, bound to a local variable of the
+generated function.
+
+With `fail_fast = True`, the generated function returns as soon as an error is found,
+like `Schema.check` in fail fast mode.
+
+Compiling the generated source code is the slowest part of the compilation. The code objects
+saved by `naval.spec.dumps` are registered in `_codes` when loaded, and reused
+(until `clear_cache` is called).
+"""
+
+from __future__ import unicode_literals
+import hashlib
+from naval.core import (
+    Delete, DefaultFunc, Do, Each, ErrorRecord, In, Length, MoveTo, Range, Regex, Save, SaveAs, Schema,
+    Type, _DICT_TYPE, _MappingProxyType
+)
+
+__all__ = ['clear_cache', 'compile_schema']
+
+
+class _Generator(object):
+
+    def __init__(self, schema, fail_fast = False):
+        self.schema = schema
+        self.fail_fast = fail_fast
+        self.lines = []
+        self.constants = {}
+        self._names = {}
+
+    def const(self, obj, prefix = 'c'):
+        """
+        Returns the name of a local variable of the generated function bound to `obj`.
+        """
+        key = id(obj), prefix
+        try:
+            return self._names[key][0]
+        except KeyError:
+            name = '%s%d' % (prefix, len(self._names))
+            # keep a reference to obj so its id can't be reused
+            self._names[key] = (name, obj)
+            self.constants[name] = obj
+            return name
+
+    def emit(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    def emit_copy(self, indent):
+        # the input dictionary is copied before the first modification
+        self.emit(indent, 'if dct is dict_:')
+        self.emit(indent + 1, 'dct = dict_.copy()')
+
+    def emit_error(self, indent, key, details):
+        self.emit(indent, 'errors[%s] = %s' % (key, details))
+        if self.fail_fast:
+            self.emit(indent, 'return False, errors')
+
+    def flatten(self, filters):
+        # a Do without a custom error message is just a sequence of filters
+        for f in filters:
+            if type(f) is Do and not f.error_message:
+                for sub in self.flatten(f._filters):
+                    yield sub
+            else:
+                yield f
+
+    def emit_filter(self, indent, f):
+        """
+        Emits the code applying the filter `f` to the local variable `value`.
+        On failure, the generated code sets `ok` to False and puts the error details in `value`.
+        """
+        cls = type(f)
+        if cls is Type:
+            if f._subclasses:
+                test = 'not issubclass(type(value), %s)' % self.const(f.types)
+            else:
+                test = 'type(value) not in %s' % self.const(frozenset(f.types))
+            self.emit(indent, 'if %s:' % test)
+            self.emit(indent + 1, 'ok, value = %s(value)' % self.const(f.check, 'check'))
+        elif cls is Range:
+            tests = []
+            if f.min is not None:
+                tests.append('value < %s' % self.const(f.min))
+            if f.max is not None:
+                tests.append('value > %s' % self.const(f.max))
+            if tests:
+                self.emit(indent, 'if %s:' % ' or '.join(tests))
+                self.emit(indent + 1, 'ok, value = %s(value)' % self.const(f.check, 'check'))
+            else:
+                self.emit(indent, 'pass')
+        elif cls is Length:
+            tests = ['len(value) < %s' % self.const(f.min)]
+            if f.max is not None:
+                tests.append('len(value) > %s' % self.const(f.max))
+            self.emit(indent, 'if %s:' % ' or '.join(tests))
+            self.emit(indent + 1, 'ok, value = %s(value)' % self.const(f.check, 'check'))
+        elif cls is In:
+            self.emit(indent, 'if value not in %s:' % self.const(f.collection))
+            self.emit(indent + 1, 'ok, value = False, %s' % self.const(ErrorRecord(f.code, f.error_message)))
+        elif cls is Regex:
+            self.emit(indent, 'if not %s(value):' % self.const(f.match, 'match'))
+            self.emit(indent + 1, 'ok, value = False, %s' % self.const(ErrorRecord(f.code, f.error_message)))
+        else:
+            self.emit(indent, 'ok, value = %s(value)' % self.const(f.check, 'check'))
+
+    def emit_filters(self, indent, chain, error_key):
+        """
+        Emits the filters of a chain and its storage instruction.
+        The current value is expected in the `value` local variable.
+        """
+        filters = list(self.flatten(chain.filters))
+        storage = chain.storage_instruction
+        field = self.const(chain.field[0], 'field') if chain.field else None
+        if filters:
+            self.emit(indent, 'ok = True')
+            for i, f in enumerate(filters):
+                if i == 0:
+                    self.emit_filter(indent, f)
+                else:
+                    self.emit(indent, 'if ok:')
+                    self.emit_filter(indent + 1, f)
+            self.emit(indent, 'if not ok:')
+            if isinstance(storage, (SaveAs, MoveTo)):
+                self.emit(indent + 1, 'errors[%s] = value' % error_key)
+                self.emit_error(indent + 1, self.const(storage.name, 'field'), 'COULDNT_COMPUTE')
+            else:
+                self.emit_error(indent + 1, error_key, 'value')
+            if not storage:
+                return
+            self.emit(indent, 'else:')
+            indent += 1
+        if not storage:
+            self.emit(indent, 'pass')
+            return
+        if storage is Save:
+            if field is None:
+                self.emit(indent, 'dct = value')
+            else:
+                # saving the value unchanged doesn't modify the dictionary
+                self.emit(indent, 'if dct.get(%s, MISSING) is not value:' % field)
+                self.emit_copy(indent + 1)
+                self.emit(indent + 1, 'dct[%s] = value' % field)
+            return
+        self.emit_copy(indent)
+        if type(storage) is SaveAs:
+            self.emit(indent, 'dct[%s] = value' % self.const(storage.name, 'field'))
+        elif type(storage) is MoveTo:
+            self.emit(indent, 'dct[%s] = value' % self.const(storage.name, 'field'))
+            self.emit(indent, 'dct.pop(%s, None)' % field)
+        elif storage is Delete:
+            self.emit(indent, 'dct.pop(%s, None)' % field)
+        else:
+            self.emit(
+                indent,
+                '%s(dct, %s, value)' % (self.const(storage.execute, 'execute'), field)
+            )
+
+    def emit_chain(self, chain):
+        if not chain.field:
+            # global rule: only run on a document without errors
+            self.emit(1, 'if not errors:')
+            self.emit(2, 'value = dct')
+            self.emit_filters(2, chain, "'*'")
+            return
+
+        field = self.const(chain.field[0], 'field')
+        if chain.discard:
+            self.emit(1, 'if %s in dct:' % field)
+            self.emit(2, 'if dct[%s] in %s:' % (field, self.const(chain.discard)))
+            self.emit_copy(3)
+            self.emit(3, 'del dct[%s]' % field)
+        # not `dct[field]` and KeyError: a defaultdict would insert the missing field
+        self.emit(1, 'if %s in dct:' % field)
+        self.emit(2, 'value = dct[%s]' % field)
+        self.emit(1, 'else:')
+        if chain.optional:
+            self.emit(2, 'value = MISSING')
+        elif chain.default:
+            default = self.const(chain.default.getvalue, 'default')
+            if isinstance(chain.default, DefaultFunc):
+                # avoid working with potentially invalid data
+                self.emit(2, 'if errors:')
+                self.emit(3, 'value = MISSING')
+                self.emit(2, 'else:')
+                self.emit_copy(3)
+                self.emit(3, 'dct[%s] = value = %s(dct)' % (field, default))
+            else:
+                self.emit_copy(2)
+                self.emit(2, 'dct[%s] = value = %s(dct)' % (field, default))
+        else:
+            self.emit_error(2, field, 'FIELD_MISSING')
+            self.emit(2, 'value = MISSING')
+        self.emit(1, 'if value is not MISSING:')
+        self.emit_filters(2, chain, field)
+
+    def emit_schema(self):
+        schema = self.schema
+        self.emit(1, 'if not issubclass(type(dict_), dict):')
+        self.emit(2, 'return TYPE_DICT(dict_)')
+        self.emit(1, 'dct = dict_')
+        self.emit(1, 'errors = {}')
+        policy = schema.unexpected_keys_policy
+        if policy is not Schema.KEEP:
+            expected = self.const(schema.expected_fields)
+            self.emit(1, 'if not %s.issuperset(dict_):' % expected)
+            if policy is Schema.FAIL:
+                # no need to remove the keys: the output will be the errors
+                self.emit(2, 'for key in dict_:')
+                self.emit(3, 'if key not in %s:' % expected)
+                self.emit_error(4, 'key', 'UNEXPECTED_KEY(key)')
+            else:
+                self.emit(2, 'dct = %s(dict_)' % self.const(schema._keep_expected_keys, 'keep'))
+        for chain in schema.chains:
+            self.emit_chain(chain)
+        self.emit(1, 'if errors:')
+        self.emit(2, 'return False, errors')
+        if schema.read_only:
+            self.emit(1, 'if dct is dict_:')
+            self.emit(2, 'return True, READ_ONLY(dct)')
+        self.emit(1, 'return True, dct')
+
+    def source(self):
+        # the constants are unpacked from a dictionary rather than passed as arguments,
+        # since a function can't have more than 255 arguments before python 3.7
+        return '\n'.join(
+            ['def make(constants):']
+            + ['    %s = constants[%r]' % (name, name) for name in sorted(self.constants)]
+            + ['    ' + line for line in ['def check(dict_):'] + self.lines]
+            + ['    return check']
+        )
+
+def _nested_schemas(filters):
+    for f in filters:
+        if isinstance(f, Schema):
+            yield f
+        elif isinstance(f, Do):
+            for sub in _nested_schemas(f._filters):
+                yield sub
+        elif isinstance(f, Each):
+            for sub in _nested_schemas([f._filter]):
+                yield sub
+
+# {digest of a generated source code: code object}, filled by naval.spec.loads
+_codes = {}
+
+def clear_cache():
+    """
+    Forgets the code objects registered by `naval.spec.loads`: the schemas compiled afterwards
+     have their source code compiled again.
+    """
+    _codes.clear()
+
+def _digest(source):
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+def _generate(schema, fail_fast):
+    gen = _Generator(schema, fail_fast)
+    gen.emit_schema()
+    return gen
+
+def _compile_source(source):
+    code = _codes.get(_digest(source)) if _codes else None
+    if code is None:
+        code = compile(source, '<naval compiled schema>', 'exec')
+    return code
+
+def _compiled_codes(schema, codes):
+    """
+    Adds to `codes` the code objects of the functions generated for `schema` and for the schemas
+    nested in it, if they're compiled. They're indexed by the digests of their source code.
+    """
+    if schema._compiled_check is not None:
+        for fail_fast in (False, True):
+            source = _generate(schema, fail_fast).source()
+            key = _digest(source)
+            if key not in codes:
+                codes[key] = _compile_source(source)
+    for chain in schema.chains:
+        for f in _nested_schemas(chain.filters):
+            _compiled_codes(f, codes)
+    return codes
+
+def compile_schema(schema, fail_fast = False):
+    """
+    Returns a function equivalent to the interpreted `check` method of `schema`
+    (in fail fast mode if `fail_fast` is True).
+    The nested schemas that aren't compiled yet are compiled too.
+    """
+    for chain in schema.chains:
+        for f in _nested_schemas(chain.filters):
+            if f._compiled_check is None:
+                f.compile()
+    gen = _generate(schema, fail_fast)
+    namespace = {
+        'MISSING': object(),
+        'TYPE_DICT': _DICT_TYPE.check,
+        'FIELD_MISSING': schema._missing_field_error,
+        'COULDNT_COMPUTE': schema._computation_error,
+        'UNEXPECTED_KEY': schema._unexpected_key_error,
+        'READ_ONLY': _MappingProxyType
+    }
+    exec(_compile_source(gen.source()), namespace)
+    return namespace['make'](gen.constants)
@@ -1,84 +1,572 @@
 from __future__ import unicode_literals
-from past.builtins import basestring
-import functools, gettext, re, sys, os
-from postpone import evalr, LazyString as _
+from past.builtins import basestring, long, unicode
+import collections, contextlib, gettext, re, sys, os, threading, time, types
+try:
+    from types import MappingProxyType as _MappingProxyType
+except ImportError: # python 2
+    _MappingProxyType = None
+from future.utils import with_metaclass
+from postpone import LazyString as _, StringLike as _StringLike
 
 __all__ = [
-    'Apply', 'Assert', 'Default', 'Delete', 'Discard', 'Do', 'Each', 'Each0', 'Each1', 'In',
-    'Length', 'MoveTo', 'Optional', 'Range', 'Regex', 'Save', 'SaveAs', 'Schema', 'Type',
-    'ValidationError'
+    'Apply', 'Assert', 'Cached', 'Default', 'Delete', 'Discard', 'Do', 'Each', 'Each0', 'Each1', 'In',
+    'ErrorRecord', 'Length', 'MoveTo', 'Optional', 'Range', 'Regex', 'Save', 'SaveAs', 'Schema',
+    'Type', 'ValidationError'
 ]
 
+try:
+    from contextvars import ContextVar as _ContextVar
+except ImportError: # python < 3.7
+    class _ContextVar(object):
+        """
+        Minimal replacement of `contextvars.ContextVar`, with a value per thread.
+        """
+        def __init__(self, name, default = None):
+            self._local = threading.local()
+            self._default = default
+
+        def get(self):
+            return getattr(self._local, 'value', self._default)
+
+        def set(self, value):
+            # like the real tokens, never None (the previous value can be)
+            token = (self.get(),)
+            self._local.value = value
+            return token
+
+        def reset(self, token):
+            self._local.value, = token
+
+# the language and locale directory of the current context (see `Settings.context`)
+_context_lang = _ContextVar('naval_lang', default = None)
+_context_locale_dir = _ContextVar('naval_locale_dir', default = None)
+
 class Settings(object):
+    """
+    The settings of naval: the default language of the error messages (`default_lang`) and the
+     directory where the translations are looked for (`locale_dir`).
+
+    Both can be changed for the current thread or asyncio task only, with `context`.
+    The settings can be shared by many threads: the translations are loaded once, under a lock,
+     and the error messages are translated without taking any lock.
+    """
+
     def __init__(self, default_lang, locale_dir = None):        
         self.default_lang = default_lang
         self._locale_dir = locale_dir
+        self._lock = threading.Lock()
+        # translation functions, keyed by (locale directory, language)
+        self._translators = {}
+
+    @property
+    def lang(self):
+        """
+        The language of the error messages when no language is given to `validate`: the one of
+         the current context, or `default_lang`.
+        """
+        return _context_lang.get() or self.default_lang
 
     @property
     def locale_dir(self):
-        if self._locale_dir:
+        """
+        The directory of the translations: the one of the current context, or the one set for
+         all the threads, or else the `locale` directory of the naval package.
+        """
+        locale_dir = _context_locale_dir.get() or self._locale_dir
+        if locale_dir:
+            return locale_dir
+        with self._lock: # searched only once
+            if not self._locale_dir:
+                for path in sys.path:
+                    candidate = os.path.join(path, 'naval', 'locale')
+                    if os.path.isdir(candidate):
+                        self._locale_dir = candidate
+                        break
+                else:
+                    raise IOError("Couldn't find locale directory.")
             return self._locale_dir
-        for path in sys.path:
-            candidate = os.path.join(path, 'naval', 'locale')
-            if os.path.isdir(candidate):
-                self._locale_dir = candidate
-                return candidate
-        raise IOError("Couldn't find locale directory.")
         
     @locale_dir.setter
     def locale_dir(self, directory):
+        # the translators are keyed by directory, the ones of the previous directory are dropped
+        self._translators = {}
         self._locale_dir = directory
+
+    @contextlib.contextmanager
+    def context(self, lang = None, locale_dir = None):
+        """
+        Context manager changing the language of the error messages and/or the directory of the
+         translations, for the current thread or asyncio task only (the asyncio tasks created
+         in the block inherit them).
+
+        Example:
+
+            with naval.settings.context(lang = request.lang):
+                handle(request) # validate is called with no lang argument
+        """
+        lang_token = _context_lang.set(lang) if lang else None
+        locale_dir_token = _context_locale_dir.set(locale_dir) if locale_dir else None
+        try:
+            yield self
+        finally:
+            if locale_dir_token is not None:
+                _context_locale_dir.reset(locale_dir_token)
+            if lang_token is not None:
+                _context_lang.reset(lang_token)
+
+    def translator(self, lang = None):
+        """
+        Returns the function used to translate the error messages in the language `lang`
+         (by default, the language of the current context, see `lang`).
+        The gettext translations are loaded once per locale directory and language.
+        English messages are returned as is, without looking for a translation.
+        If no translation is available for `lang`, the messages aren't translated.
+        """
+        lang = lang or _context_lang.get() or self.default_lang
+        if lang == 'en':
+            return _untranslated
+        try:
+            return self._translators[(_context_locale_dir.get() or self._locale_dir, lang)]
+        except KeyError:
+            pass
+        try:
+            locale_dir = self.locale_dir
+        except (IOError, OSError):
+            return _untranslated
+        with self._lock: # loaded only once
+            translate_message = self._translators.get((locale_dir, lang))
+            if translate_message is None:
+                try:
+                    translate_message = self._load_translator(lang, locale_dir)
+                except (IOError, OSError): # OSError from python 3.3, IOError before that 
+                    translate_message = _untranslated
+                self._translators[(locale_dir, lang)] = translate_message
+        return translate_message
+
+    def preload_languages(self, languages):
+        """
+        Loads the translations for the given languages, so that the first error messages
+        translated in these languages don't have to wait for the translation files to be read.
+        Raises IOError (or OSError) if a translation can't be found.
+
+        Example:
+
+            naval.settings.preload_languages(['fr', 'de'])
+        """
+        locale_dir = self.locale_dir
+        for lang in languages:
+            if lang != 'en':
+                self._translators[(locale_dir, lang)] = self._load_translator(lang, locale_dir)
+
+    def _load_translator(self, lang, locale_dir):
+        translation = gettext.translation("naval", locale_dir, [lang])
+        try:
+            return translation.ugettext # python 2
+        except AttributeError:
+            return translation.gettext # python 3
+
+def _untranslated(message):
+    return message
         
 settings = Settings('en')
 
+class ErrorRecord(object):
+    """
+    The error details of a failed check, before their translation.
+    `code` identifies the error, `template` is its message (a lazy string or a str) and `params`
+     the dictionary of the values that complete the message (with `str.format`), or None.
+    `path` is the position of the invalid value, relative to the value that the error details
+     describe: the index of an item for an error reported by `Each`, or ().
+
+    Records are evaluated like lazy strings, with their `eval` method, and `naval.core.evalr`
+     translates them in trees of error details.
+    The translation and formatting of the message only happen when it's required.
+
+    >>> ErrorRecord('max', _("The maximum is {max}."), {'max': 10}).eval(str)
+    'The maximum is 10.'
+    """
+    # The records are created for every failed check, so they're as small as possible: a
+    # single object, rather than the lazy strings built by `format` (an expression holding
+    # a tuple, a dictionary and the lazy template), without a __dict__ (that's why they don't
+    # inherit from postpone.StringLike).
+
+    __slots__ = ('code', 'path', 'template', 'params')
+
+    def __init__(self, code, template, params = None, path = ()):
+        self.code = code
+        self.template = template
+        self.params = params
+        self.path = path
+
+    def eval(self, func):
+        template = self.template
+        if isinstance(template, _StringLike):
+            template = template.eval(func)
+        if self.params:
+            return template.format(**self.params)
+        return template
+
+    def string_type(self):
+        return type(self.eval(_untranslated))
+
+    def __reduce__(self):
+        return (self.__class__, (self.code, self.template, self.params, self.path))
+
+    def __str__(self):
+        return str(self.eval(_untranslated))
+
+    def __repr__(self):
+        return 'ErrorRecord(%r, %r)' % (self.code, self.eval(_untranslated))
+
+class _ItemErrorRecord(ErrorRecord):
+    """
+    The error details of an invalid item, reported by `Each`. The message of the item's own
+     error details is prefixed with the number of the item (the numbers of the items, for
+     nested collections).
+    """
+
+    __slots__ = ('numbers',)
+
+    prefix = _("Item #%s: ")
+
+    def __init__(self, code, template, params, path, numbers):
+        ErrorRecord.__init__(self, code, template, params, path)
+        self.numbers = numbers
+
+    def eval(self, func):
+        prefix = self.prefix.eval(func)
+        return ''.join(prefix % number for number in self.numbers) + ErrorRecord.eval(self, func)
+
+    def __reduce__(self):
+        return (
+            self.__class__, (self.code, self.template, self.params, self.path, self.numbers)
+        )
+
+def evalr(obj, func):
+    """
+    Same as `postpone.evalr`, but also evaluates the error records: translates the messages
+     of a tree of error details, with the translation function `func`.
+    """
+    if isinstance(obj, (ErrorRecord, _StringLike)):
+        return obj.eval(func)
+    elif isinstance(obj, dict):
+        return dict((key, evalr(value, func)) for key, value in obj.items())
+    elif isinstance(obj, list):
+        return [evalr(elem, func) for elem in obj]
+    elif isinstance(obj, tuple):
+        return tuple(evalr(elem, func) for elem in obj)
+    elif isinstance(obj, set):
+        return set(evalr(elem, func) for elem in obj)
+    return obj
+
 class ValidationError(Exception):
-    def __init__(self, error_details):
-        self.error_details = error_details
+    """
+    Raised by `validate` (and by the `run` method of the filters) when a value is invalid.
+    `error_details` describes why: a message, or a dictionary of error details, indexed by the
+     fields of a dictionary or the positions of the items of a collection.
+    When the error details must be translated, they're translated the first time that
+     `error_details` is read.
+    """
+
+    def __init__(self, error_details, translate = None):
+        Exception.__init__(self, error_details) # `args` is just the error details
+        self._error_details = error_details
+        self._translate = translate
+        self._translated = None
+
+    @property
+    def error_details(self):
+        if self._translate is None:
+            return self._error_details
+        if self._translated is None:
+            self._translated = evalr(self._error_details, self._translate)
+        return self._translated
+
+    @error_details.setter
+    def error_details(self, error_details):
+        self._error_details = error_details
+        self._translate = self._translated = None
+
+    def to_dict(self, lang = None):
+        """
+        Returns the error details, in the same format as `error_details`, and translated
+         in the language `lang` if it's given.
+        """
+        if lang is None:
+            return self.error_details
+        return evalr(self._error_details, settings.translator(lang))
+
+    def codes(self):
+        """
+        Returns the error codes, in the same structure as `error_details`: the code of the
+         error, or a dictionary of codes. The code of a custom error message is None, unless
+         it's an `ErrorRecord`.
+
+        >>> try:
+                address_schema.validate({'street': 'st', 'city': 75})
+            except ValidationError as exc:
+                print(exc.codes())
+        {'house number': 'missing', 'street': 'too_short', 'city': 'type'}
+        """
+        return _error_codes(self._error_details)
+
+    def errors(self, lang = None):
+        """
+        Returns a list with a dictionary for every error: its `path` (the tuple of the keys and
+         indexes leading to the invalid value), its `code`, its `params` and its `message`,
+         translated in the language `lang` if it's given.
+        """
+        if lang is not None:
+            translate = settings.translator(lang)
+        else:
+            translate = self._translate or _untranslated
+        return [
+            {
+                'path': path, 'code': record.code, 'params': record.params or {},
+                # the message of the record itself, the path gives the items numbers
+                'message': ErrorRecord.eval(record, translate)
+            }
+            for path, record in _error_records(self._error_details, ())
+        ]
+
+    def _readable_details(self):
+        # the error details are evaluated even without translation (raised by `run`)
+        if self._translate is None:
+            return evalr(self._error_details, _untranslated)
+        return self.error_details
+
+    def __str__(self):
+        return str(self._readable_details())
+
+    def __repr__(self):
+        # not `args`, that holds the untranslated error details
+        return '%s(%r)' % (type(self).__name__, self._readable_details())
+
+    def __reduce__(self):
+        return (self.__class__, (self.error_details,), self._extra_state())
+
+    def _extra_state(self):
+        # attributes added after the creation, like the `index` of `validate_many`
+        state = self.__dict__.copy()
+        for name in ('_error_details', '_translate', '_translated'):
+            del state[name]
+        return state or None
+
+def _error_codes(error_details):
+    if isinstance(error_details, dict):
+        return dict((key, _error_codes(details)) for key, details in error_details.items())
+    if isinstance(error_details, ErrorRecord):
+        return error_details.code
+    return None
+
+def _error_records(error_details, path):
+    """
+    Yields a pair `(path, record)` for every error in `error_details`.
+    """
+    if isinstance(error_details, dict):
+        for key, details in error_details.items():
+            for pair in _error_records(details, path + (key,)):
+                yield pair
+    elif isinstance(error_details, ErrorRecord):
+        yield path + error_details.path, error_details
+    else:
+        yield path, ErrorRecord(None, error_details)
+
+class _FilterType(type):
+    """
+    Metaclass of Filter.
+    A class that overrides `run` but inherits `check` from a built-in filter gets back the
+     `check` method of Filter (which calls `run`): otherwise the schemas, which only call
+     `check`, would silently skip the new `run`.
+    The inherited `check` is kept in `_overridden_check`, for `Filter.run` (when the new `run`
+     calls the one of its parent class).
+    """
+    def __init__(cls, name, bases, namespace):
+        super(_FilterType, cls).__init__(name, bases, namespace)
+        if 'run' in namespace and 'check' not in namespace and cls.check != Filter.check:
+            cls._overridden_check = getattr(cls.check, '__func__', cls.check)
+            cls.check = Filter.__dict__['check']
 
-class Filter(object):
+class Filter(with_metaclass(_FilterType, object)):
     """
     Base class for all transformation and/or validation operations.
-    The subclasses of Filter override the `run` method.
+    The subclasses of Filter override either the `run` method or the `check` method.
+    Each of these methods is implemented in terms of the other one.
+    A subclass of a built-in filter may override `run` only: its `check` method then calls
+     the new `run`.
+
+    The `pure` attribute tells whether the filter always gives the same result for the same
+     value, without side effects (see the `cache` argument of `Schema`).
+     It's False by default: the filters that are pure have to say so.
     """
+
+    pure = False
+    _overridden_check = None # see _FilterType
+
     def run(self, value):
         """
         This method should raise a ValidationError if its argument is invalid.
         Otherwise, (if it's valid), it should return the argument, or a computed value in the 
         case of a transformation filter.
         """
-        raise NotImplementedError
+        if type(self).check == Filter.check:
+            if self._overridden_check is None:
+                raise NotImplementedError
+            ok, result = self._overridden_check(value)
+        else:
+            ok, result = self.check(value)
+        if ok:
+            return result
+        raise ValidationError(result)
+
+    def check(self, value):
+        """
+        Same as `run`, but doesn't raise a ValidationError if its argument is invalid.
+        Returns a pair `(ok, result)`:
+            `(True, value)` if the argument is valid, `value` being what `run` would return.
+            `(False, error_details)` if the argument is invalid, `error_details` being what
+             `run` would have put in the ValidationError.
+        The built-in filters implement this method directly, since it's cheaper not to raise
+         and catch exceptions when validation fails.
+        """
+        try:
+            return True, self.run(value)
+        except ValidationError as exc:
+            return False, exc.error_details
 
-    def validate(self, value, lang = None):
+    def validate(self, value, lang = None, fail_fast = False):
         """
-        Encapsulates the `run` method.
+        Encapsulates the `check` method.
+        Returns the (possibly transformed) value, or raises a ValidationError.
         Translates the error messages if necessary.
+        With `fail_fast = True`, the schemas stop at the first error they find (see `Schema`).
         Subclasses shouldn't need to override this method.
         """
+        if fail_fast:
+            ok, result = _failing_fast(self.check, value)
+        else:
+            ok, result = self.check(value)
+        if ok:
+            return result
+        raise ValidationError(result, settings.translator(lang))
+
+    def validate_many(self, iterable, lang = None, on_error = 'collect'):
+        """
+        Validates every value of `iterable`.
+        Returns a `BatchValidation` object: an iterator over `(index, result)` pairs, where
+         `index` is the position of the value in `iterable`.
+        The values are consumed one at a time, as the pairs are requested, so `iterable` can be
+         a generator over more data than would fit in memory.
+
+        `on_error` defines what to do with invalid values:
+            'collect': `result` is the ValidationError (with translated error details) instead
+              of the validated value. This is the default.
+            'raise': the ValidationError is raised. Its `index` attribute contains the position
+              of the invalid value.
+            'skip': the invalid values are left out.
+
+        Example:
+
+            >>> batch = Schema(['id', Type(int)]).validate_many(({'id': i} for i in (1, '2')))
+
+            >>> for index, result in batch:
+                    if isinstance(result, ValidationError):
+                        print(index, result.error_details)
+                    else:
+                        print(index, result)
+            0 {'id': 1}
+            1 {'id': 'Wrong type. Expected int. Got str instead.'}
+
+            >>> batch.valid, batch.invalid
+            (1, 1)
+        """
+        check = self.check
+        return BatchValidation(
+            ((index,) + check(value) for index, value in enumerate(iterable)),
+            on_error,
+            settings.translator(lang)
+        )
+
+class BatchValidation(object):
+    """
+    Iterator returned by `Filter.validate_many`.
+    It consumes `(index, ok, result)` triples, `ok` and `result` being the return value of
+     the `check` method of a filter. If `translate_message` is None, the error details
+     are expected to be translated already.
+    While the values are validated, the following statistics are updated:
+        `total`: number of values validated so far
+        `valid`: number of valid values
+        `invalid`: number of invalid values
+        `error_counts`: dictionary mapping each key found in the error details of the
+          invalid values to the number of times it was found. When the error details aren't
+          a dictionary (for filters other than `Schema`), they are counted under the key '*'.
+    The `close` method stops the validation before the end, and releases the resources of
+     the validation (the worker processes of `naval.parallel.validate_parallel`). It's called
+     at the end of a `with` block, and when a ValidationError is raised (`on_error = 'raise'`).
+    """
+
+    ON_ERROR = ('collect', 'raise', 'skip')
+
+    def __init__(self, results, on_error, translate_message = None):
+        if on_error not in self.ON_ERROR:
+            raise ValueError(
+                "on_error should be one of %s." % ', '.join(repr(x) for x in self.ON_ERROR)
+            )
+        self.total = self.valid = self.invalid = 0
+        self.error_counts = {}
+        self._iterator = self._validate(results, on_error, translate_message)
+
+    def _validate(self, results, on_error, translate_message):
+        error_counts = self.error_counts
         try:
-            return self.run(value)
-        except ValidationError as exc:
-            lang = lang or settings.default_lang
-            if lang == 'en':
-                translate_message = lambda x:x
-            else:
-                locale_dir = settings.locale_dir
-                try:
-                    translation = gettext.translation(
-                        "naval", locale_dir, [lang]
-                    )
-                except (IOError, OSError) as exc2: # OSError from python 3.3, IOError before that 
-                    translate_message = lambda x:x
-                else:
-                    try:
-                        translate_message = translation.ugettext # python 2
-                    except AttributeError:
-                        translate_message = translation.gettext # python 3
-            raise ValidationError(evalr(exc.error_details, translate_message))
+            for index, ok, result in results:
+                self.total += 1
+                if ok:
+                    self.valid += 1
+                    yield index, result
+                    continue
+                self.invalid += 1
+                for key in (result if isinstance(result, dict) else ('*',)):
+                    error_counts[key] = error_counts.get(key, 0) + 1
+                if on_error == 'skip':
+                    continue
+                exc = ValidationError(result, translate_message)
+                if on_error == 'raise':
+                    exc.index = index
+                    raise exc
+                yield index, exc
+        finally:
+            # the traceback of an exception would keep `results` alive
+            close = getattr(results, 'close', None)
+            if close is not None:
+                close()
+
+    def close(self):
+        self._iterator.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iterator)
+
+    next = __next__ # python 2
 
 class _Optional(object):
     def __repr__(self):
         return "Optional"
 
+    def __reduce__(self):
+        # pickled by name, so that unpickling gives back the same object
+        # (a str, even on python 2, where the literals of this module are unicode)
+        return str('Optional')
+
 Optional = _Optional()
 
 del _Optional
@@ -95,10 +583,14 @@ class DefaultVal(DefaultBase):
         return self._val
 
 class DefaultFunc(DefaultBase):
+    def __init__(self, val, pure = False):
+        self._val = val
+        self.pure = pure
+
     def getvalue(self, dct):
         return self._val(dct)
 
-def Default(val):
+def Default(val, pure = False):
     """
     `Default` should be placed after a field name in a chain.
     The `Default` constructor takes an object or a callable as an argument.
@@ -119,9 +611,13 @@ def Default(val):
             ['username', Default(lambda d: d['email'])]
         )
         This would set the username to be the email address if no username was supplied.        
+
+    A schema using a callable is only allowed to cache its results (see `Schema`) if the callable
+     is declared pure, that is, if it always returns the same value for the same dictionary:
+        ['username', Default(lambda d: d['email'], pure = True)]
     """
     if callable(val):
-        return DefaultFunc(val)
+        return DefaultFunc(val, pure)
     else:
         return DefaultVal(val)
 
@@ -169,6 +665,9 @@ class Discard(tuple):
     def __new__(cls, *args):
         return super(Discard, cls).__new__(cls, args)
 
+    def __reduce__(self):
+        return (Discard, tuple(self))
+
 class Chain(object):
 
     def _parse_start(self, instructions):
@@ -226,6 +725,16 @@ class Chain(object):
         if instructions:
             self._parse_start(instructions)
 
+    @property
+    def pure(self):
+        return (
+            getattr(self.default, 'pure', True)
+            and all(f.pure for f in self.filters)
+        )
+
+# value of a chain that doesn't run (see `Schema._chain_value`)
+_SKIP = object()
+
 class Schema(Filter):
     """
     Defines a sequence of validation and/or transformation rules, to validate and/or transform
@@ -260,8 +769,13 @@ class Schema(Filter):
     For that, use the modification instructions when you define your schema.
     The modification instructions are Default, Delete, Discard, MoveTo, Save and SaveAs.
 
-    If you don't use any of these instructions, the `validate` method will return a shallow copy of the 
-    original with no modification.
+    If you don't use any of these instructions, the `validate` method will return the original
+    dictionary itself. More generally, the input dictionary is only copied when an instruction
+    actually modifies it (saving a value that a filter returned unchanged doesn't count).
+    Likewise, `Each` returns the original list or tuple if none of its items was transformed.
+    So don't modify the return value of `validate` if you still need the input unchanged, or
+    create the schema with `read_only = True`: the dictionaries returned unmodified are then
+    wrapped in a read only view (a `types.MappingProxyType`, available from Python 3.3).
 
     For example:
 
@@ -308,101 +822,439 @@ class Schema(Filter):
      returned by the `validate` method).
     With `unexpected_keys=Schema.DELETE`, the schema will agree to validate a dictionary that
      contains unknown keys, but these items won't appear in the output dictionary.
+
+    The optional `max_concurrency` argument limits the number of asynchronous filters
+     (see `naval.aio`) awaited at the same time by `validate_async`.
+
+    With the optional `cache` argument, the schema remembers the results of the validation of
+     the `cache` most recently seen dictionaries, and doesn't run its chains again when it's given
+     an identical dictionary. Only the dictionaries whose values are all scalars (strings, numbers,
+     booleans and None) are cached. A valid dictionary gives a new shallow copy of the cached
+     output every time.
+    Caching is only allowed if every step of the schema always gives the same result for the same
+     input. The functions passed to `Apply`, `Assert` and `Default` (or directly put in a chain)
+     can do anything, so they have to be declared pure:
+
+        >>> Schema(
+                ['name', Type(str), Apply(str.strip, pure = True), Save],
+                ['country', Default(guess_country, pure = True)],
+                cache = 1000
+            )
+
+     Otherwise, a ValueError is raised.
+
+    With `fail_fast = True`, the schema stops at the first failing chain, and so do the schemas
+     nested in it: the error details only contain the first error found. Use it when you only
+     need to know whether a dictionary is valid, and one reason why it isn't. The fail fast mode
+     can also be chosen for a single validation, with the `fail_fast` argument of `validate`.
+     The `is_valid` method uses it too.
+
+    With `profile = True`, the schema records statistics about its chains and filters (and
+     those of the schemas nested in it) in its `profile` attribute. See `naval.profiling`.
     """
 
     FAIL = 1
     KEEP = 2
     DELETE = 3
 
+    unexpected_key_message = _("Unexpected key {key}.")
+    missing_field_message = _("Field is missing.")
+    computation_error_message = _("Couldn't compute field.")
+
     def __init__(self, *lists, **kwargs):
-        unexpected_keys, = _get_kwargs(kwargs, (('unexpected_keys', Schema.FAIL),))
+        unexpected_keys, max_concurrency, cache, profile, fail_fast, read_only = _get_kwargs(
+            kwargs, (
+                ('unexpected_keys', Schema.FAIL), ('max_concurrency', None), ('cache', None),
+                ('profile', False), ('fail_fast', False), ('read_only', False)
+            )
+        )
         self.chains = [Chain(*lst) for lst in lists]
         self.unexpected_keys_policy = unexpected_keys
-        self.expected_fields = set(functools.reduce(
-            list.__add__,
-            (chain.field for chain in self.chains),
-            []
-        ))
-
-    def run(self, dict_):
-        Type(dict, subclasses = True).run(dict_)
-        dct = dict_.copy()
-        errors = {}
-        policy = self.unexpected_keys_policy
-        if policy is not Schema.KEEP:
-            for key in dict_:
-                if key not in self.expected_fields:
-                    if policy is Schema.FAIL:
-                        errors[key] = _("Unexpected key {key}.").format(key = repr(key))
-                    del dct[key]
+        self.max_concurrency = max_concurrency
+        self.fail_fast = fail_fast
+        self._chains_by_field = collections.OrderedDict()
+        for chain in self.chains:
+            if chain.field:
+                self._chains_by_field.setdefault(chain.field[0], []).append(chain)
+        self.expected_fields = frozenset(self._chains_by_field)
+        self._required_fields = self._find_required_fields()
+        if read_only and _MappingProxyType is None:
+            raise ValueError("The read_only argument requires Python 3.3 or later.")
+        self.read_only = read_only
+        self._compiled_check = self._compiled_check_fail_fast = None
+        self._cache = None
+        if cache:
+            for i, chain in enumerate(self.chains):
+                if not chain.pure:
+                    raise ValueError(
+                        "Can't cache the results of a schema with impure steps "
+                        "(in the chain #%d, %s). Use the pure argument of Apply, Assert or Default "
+                        "if they always give the same result for the same input." % (
+                            i + 1, 'field %r' % chain.field[0] if chain.field else 'global rule'
+                        )
+                    )
+            self._cache = _LRUCache(cache)
+        self.profile = None
+        if profile:
+            from naval import profiling
+            self.profile = profiling.Profile() if profile is True else profile
+            self._enable_profiling()
+
+    def _enable_profiling(self):
+        # only this schema is profiled: its `check` method is replaced, not the one of the class
+        from naval import profiling
+        self.check = types.MethodType(profiling.check, self)
+
+    @property
+    def pure(self):
+        return all(chain.pure for chain in self.chains)
+
+    def _unexpected_key_error(self, key):
+        return ErrorRecord('unexpected_key', self.unexpected_key_message, {'key': repr(key)})
+
+    @property
+    def _missing_field_error(self):
+        return ErrorRecord('missing', self.missing_field_message)
 
+    @property
+    def _computation_error(self):
+        return ErrorRecord('compute', self.computation_error_message)
+
+    def _find_required_fields(self):
+        """
+        Returns the fields that must be present in a valid dictionary, in the order of the chains,
+         or None if some chain modifies the dictionary in a way that can't be foreseen.
+        """
+        required = []
+        written = set()
         for chain in self.chains:
+            storage = chain.storage_instruction
+            if not chain.field:
+                if storage:
+                    return None
+                continue
+            field = chain.field[0]
+            if not (chain.optional or chain.default or field in written or field in required):
+                required.append(field)
+            if chain.default:
+                written.add(field) # the next chains find the default value
+            if type(storage) in (SaveAs, MoveTo):
+                written.add(storage.name)
+            elif storage and storage is not Save and storage is not Delete:
+                return None
+        return tuple(required)
+
+    def _keep_expected_keys(self, dict_):
+        """
+        Returns a copy of `dict_` without the unexpected keys, in the order of `dict_`.
+        """
+        if type(dict_) is dict:
+            expected = self.expected_fields
+            return dict((key, value) for key, value in dict_.items() if key in expected)
+        dct = dict_.copy() # keep the type of the input
+        for key in set(dict_).difference(self.expected_fields):
+            del dct[key]
+        return dct
 
-            if chain.field:
-                field = chain.field[0]
-                if field in dct:
-                    if dct[field] in chain.discard:
-                        del dct[field]
-                try:
-                    value = dct[field]
-                except KeyError:
-                    if chain.optional:
-                        continue
-                    if chain.default:
-                        if errors and isinstance(chain.default, DefaultFunc):
-                            continue # avoid working with potentially invalid data
-                        dct[field] = value = chain.default.getvalue(dct)
-                    else:
-                        errors[field] = _("Field is missing.")
-                        continue
+    def compile(self):
+        """
+        Generates a python function specialized for this schema, and uses it in place of the
+        generic implementation of the `run` method. The nested schemas are compiled too.
+        Returns the schema itself, so you can write:
+
+            address_schema = Schema(
+                ['house number', Type(int), Range(1, 10000)],
+                ['street', Type(str), Length(min=5, max=255)]
+            ).compile()
+
+        The compiled schema accepts and rejects exactly the same dictionaries, with the same
+        error details. It is just faster.
+        Don't modify the chains of a schema after having compiled it.
+        """
+        from naval.compiler import compile_schema
+        self._compiled_check = compile_schema(self)
+        self._compiled_check_fail_fast = compile_schema(self, fail_fast = True)
+        return self
+
+    def to_spec(self):
+        """
+        Returns a description of the schema made of JSON compatible data (dictionaries, lists,
+        strings, numbers, booleans and None), from which `Schema.from_spec` builds the schema
+        again. See `naval.spec`.
+        """
+        from naval.spec import to_spec
+        return to_spec(self)
+
+    @staticmethod
+    def from_spec(spec):
+        """
+        Builds a schema from a description returned by `to_spec`.
+        """
+        from naval.spec import from_spec
+        return from_spec(spec)
+
+    def __getstate__(self):
+        # the generated functions can't be pickled, they're generated again after unpickling
+        state = self.__dict__.copy()
+        state['_compiled_check'] = self._compiled_check is not None
+        del state['_compiled_check_fail_fast']
+        state.pop('check', None) # set again by _enable_profiling
+        return state
+
+    def __setstate__(self, state):
+        compiled = state.pop('_compiled_check')
+        self.__dict__.update(state)
+        self._compiled_check = self._compiled_check_fail_fast = None
+        if compiled:
+            self.compile()
+        if self.profile is not None:
+            self._enable_profiling()
+
+    def check(self, dict_):
+        if _profiled_check is not None:
+            return _profiled_check(self, dict_)
+        if self._cache is not None:
+            return self._cached_check(dict_)
+        return self._check(dict_)
+
+    def _cached_check(self, dict_):
+        key = self._cache_key(dict_)
+        if key is None:
+            return self._check(dict_)
+        result = self._cache.get(key)
+        if result is None:
+            result = self._cache_result(key, dict_, *self._check(dict_))
+        return self._cached_result(result)
+
+    def _cache_key(self, dict_):
+        # None if the result of the validation of `dict_` can't be cached
+        key = _fingerprint(dict_)
+        if key is None:
+            return None
+        return (key, _fail_fast.get()) # the error details depend on the mode
+
+    def _cache_result(self, key, dict_, ok, value):
+        if ok and value is dict_:
+            # the input itself, that the caller could modify
+            value = dict(value)
+        elif ok and _MappingProxyType is not None and isinstance(value, _MappingProxyType):
+            # a read only view of the input: we keep the same kind of view on a copy
+            value = _MappingProxyType(dict(value))
+        result = (ok, value)
+        self._cache.set(key, result)
+        return result
+
+    def _cached_result(self, result):
+        ok, value = result
+        # the copy prevents the caller from modifying the cached result (a read only view is returned as is)
+        return ok, value.copy() if isinstance(value, dict) else value
+
+    def clear_cache(self):
+        """
+        Forgets the results cached by a schema created with the `cache` argument.
+        """
+        if self._cache is not None:
+            self._cache.clear()
+
+    def _check(self, dict_, chains = None):
+        """
+        Runs the chains of the schema. `chains` replaces them (with objects having the same
+         attributes), to run the generic implementation with instrumented chains (see
+         `naval.profiling`).
+        The steps of the validation are split in methods shared with `naval.aio`, which runs
+         the filters of the chains concurrently.
+        """
+        fail_fast = _fail_fast.get()
+        if self.fail_fast and not fail_fast:
+            return _failing_fast(lambda value: self._check(value, chains), dict_)
+        if chains is None:
+            if self._compiled_check is not None:
+                if fail_fast:
+                    return self._compiled_check_fail_fast(dict_)
+                return self._compiled_check(dict_)
+            chains = self.chains
+        ok, details = _DICT_TYPE.check(dict_)
+        if not ok:
+            return False, details
+        errors = {}
+        dct = self._expected_keys(dict_, errors, fail_fast)
+        if fail_fast and errors:
+            return False, errors
+
+        for chain in chains:
+            field = chain.field
+            if field and not chain.discard and field[0] in dct:
+                value = dct[field[0]] # the most common case, inlined
             else:
-                # we work on the whole document
-                if errors:
-                    continue # avoid working with potentially invalid data
-                value = dct
-            
-            # applying filters
-            error = False
+                dct, value = self._chain_value(chain, dict_, dct, errors)
+                if value is _SKIP:
+                    if fail_fast and errors:
+                        break
+                    continue
+            ok = True
             for f in chain.filters:
-                try:
-                    value = f.run(value)
-                except ValidationError as exc:
-                    if chain.field:
-                        errors[chain.field[0]] = exc.error_details
-                    else:
-                        errors['*'] = exc.error_details               
-                    error = True
+                ok, value = f.check(value)
+                if not ok:
+                    break
+            if not ok or chain.storage_instruction:
+                dct = self._chain_result(chain, dict_, dct, errors, ok, value)
+                if fail_fast and not ok:
                     break
-            if error:
-                if isinstance(chain.storage_instruction, (SaveAs, MoveTo)):
-                    errors[chain.storage_instruction.name] = _("Couldn't compute field.")
-                continue
 
-            if chain.storage_instruction:
-                if not chain.field and chain.storage_instruction is Save:
-                    dct = value
-                else:
-                    chain.storage_instruction.execute(dct, chain.field[0] if chain.field else None, value)
+        return self._check_result(dict_, dct, errors)
 
-        if errors:
-            raise ValidationError(errors)
+    def _expected_keys(self, dict_, errors, fail_fast):
+        """
+        Applies the policy for the unexpected keys of `dict_`.
+        Returns the dictionary the chains work on: `dict_` itself unless keys were removed.
+        """
+        policy = self.unexpected_keys_policy
+        expected = self.expected_fields
+        if policy is Schema.KEEP or expected.issuperset(dict_):
+            return dict_
+        if policy is Schema.FAIL:
+            # no need to remove the keys: the output will be the errors
+            for key in dict_:
+                if key not in expected:
+                    errors[key] = self._unexpected_key_error(key)
+                    if fail_fast:
+                        break
+            return dict_
+        return self._keep_expected_keys(dict_)
+
+    def _chain_value(self, chain, dict_, dct, errors):
+        """
+        Returns the pair `(dct, value)`: the dictionary being built (`dict_` is copied before
+         the first modification) and the value the filters of `chain` work on, or `_SKIP` if
+         the chain doesn't run (then, a missing field is recorded in `errors`).
+        """
+        if not chain.field:
+            # we work on the whole document
+            if errors:
+                return dct, _SKIP # avoid working with potentially invalid data
+            return dct, dct
+        field = chain.field[0]
+        if field in dct:
+            if dct[field] not in chain.discard:
+                return dct, dct[field]
+            if dct is dict_:
+                dct = dict_.copy()
+            del dct[field]
+        # not `dct[field]` and KeyError: a defaultdict would insert the missing field
+        if chain.optional:
+            return dct, _SKIP
+        if chain.default:
+            if errors and isinstance(chain.default, DefaultFunc):
+                return dct, _SKIP # avoid working with potentially invalid data
+            if dct is dict_:
+                dct = dict_.copy()
+            dct[field] = value = chain.default.getvalue(dct)
+            return dct, value
+        errors[field] = self._missing_field_error
+        return dct, _SKIP
+
+    def _chain_result(self, chain, dict_, dct, errors, ok, value):
+        """
+        Records the outcome `(ok, value)` of the filters of `chain`.
+        Returns the dictionary being built, copied from `dict_` if it had to be modified.
+        """
+        storage = chain.storage_instruction
+        if not ok:
+            errors[chain.field[0] if chain.field else '*'] = value
+            if isinstance(storage, (SaveAs, MoveTo)):
+                errors[storage.name] = self._computation_error
+        elif storage:
+            if not chain.field and storage is Save:
+                return value
+            if storage is Save and chain.field[0] in dct and dct[chain.field[0]] is value:
+                return dct # saving the value unchanged doesn't modify the dictionary
+            if dct is dict_:
+                dct = dict_.copy()
+            storage.execute(dct, chain.field[0] if chain.field else None, value)
         return dct
 
+    def _check_result(self, dict_, dct, errors):
+        if errors:
+            return False, errors
+        if dct is dict_ and self.read_only:
+            return True, _MappingProxyType(dct)
+        return True, dct
+
+    def validate_columns(self, columns, lang = None):
+        """
+        Validates data stored by columns rather than by rows: `columns` is a dictionary
+        mapping each field to a sequence (a list, a NumPy array...) of values. All the sequences
+        must have the same length. Row number `i` is the dictionary made of the `i`th value of
+        every column.
+
+        Returns a pair `(mask, errors)`. `mask` is a NumPy array of booleans telling which rows
+        are valid. `errors` maps the number of each invalid row to the error details that the
+        `validate` method would give for this row.
+
+        The elementary filters (`Type`, `Range`, `Length`, `In`, `Regex`, `int` and `float`) are
+        evaluated with NumPy operations over whole columns. The other filters are applied row by
+        row, to the rows that are still valid.
+        This method requires NumPy.
+
+        Example:
+
+        >>> mask, errors = Schema(['age', Type(int), Range(0, 150)]).validate_columns(
+                {'age': [25, 203, 'old']}
+            )
+
+        >>> mask
+        array([ True, False, False])
+
+        >>> errors
+        {1: {'age': 'The maximum is 150.'}, 2: {'age': 'Wrong type. Expected int. Got str instead.'}}
+        """
+        from naval.columns import validate_columns
+        return validate_columns(self, columns, lang)
+
+    def validate_async(self, dict_, lang = None):
+        """
+        Coroutine version of the `validate` method, for schemas using the asynchronous filters
+         `AsyncApply` and `AsyncAssert` (see `naval.aio`).
+        The chains working on different fields are run concurrently. The chains without a field
+         and the chains with a `Default` computed by a function still wait for all the preceding
+         chains, just like with `validate`.
+
+        Example:
+
+            >>> user = await user_schema.validate_async({'username': 'TheKing'})
+        """
+        from naval.aio import validate_async
+        return validate_async(self, dict_, lang)
 
-    def validate(self, dict_, lang = None):
+    def is_valid(self, dict_):
+        """
+        Tells whether a dictionary is valid. This is faster than calling `validate`: the schema
+         stops at the first error (see `fail_fast`).
+        """
+        required = self._required_fields
+        if required is not None and isinstance(dict_, dict):
+            for field in required:
+                if field not in dict_:
+                    return False
+        return _failing_fast(self.check, dict_)[0]
+
+    def validate(self, dict_, lang = None, fail_fast = False):
         # we only override it to add the docstring
         """
         Validates a dictionary against the defined schema.
         
-        On success, returns a shallow copy of the original dictionary.
+        On success, returns the original dictionary (or a read only view of it, see `read_only`).
         If the schema uses modification instructions (Default, Delete, Discard, MoveTo, Save or SaveAs),
-         the return value will be a modified version of the original dictionary.
+         the return value will be a modified copy of the original dictionary.
 
         On failure (if the input doesn't validate against the schema rules), a ValidationError is raised.
         The error details are to be found in the error_details attribute of the ValidationError object.
 
         Use the optional `lang` argument to translate the error messages in the desired language.
 
+        With `fail_fast = True`, the validation stops at the first error, which is the only one
+         reported.
+
         Example:
 
         >>> address_schema = Schema(
@@ -424,7 +1276,7 @@ class Schema(Filter):
         {'city': 'Amsterdam', 'house number': 3, 'street': 'van Rossum avenue', 'zipcode': '1011'}
 
         """
-        return super(Schema, self).validate(dict_, lang)
+        return super(Schema, self).validate(dict_, lang, fail_fast)
                   
 class StorageInstruction(object):
     def execute(self, dct, field, value):
@@ -455,6 +1307,9 @@ class _SaveClass(StorageInstruction):
     def execute(self, dct, field, value):
         dct[field] = value
 
+    def __reduce__(self):
+        return str('Save')
+
 Save = _SaveClass()
 
 del _SaveClass
@@ -546,49 +1401,71 @@ class _DeleteClass(StorageInstruction):
         except KeyError:
             pass
 
+    def __reduce__(self):
+        return str('Delete')
+
 Delete = _DeleteClass()
 
 del _DeleteClass
 
 class Apply(Filter):
 
+    code = 'invalid'
+
     def __init__(self, unary_function, catch = (Exception,),
-     error_message = None ):
+     error_message = None, pure = False, code = None):
         self.unary_function = unary_function
         self.catch = catch
         self.error_message = error_message
+        self.pure = pure
+        if code is not None:
+            self.code = code
 
-    def run(self, value):
+    def check(self, value):
         try:
-            return self.unary_function(value)
+            return True, self.unary_function(value)
         except self.catch as exc:
             if self.error_message:
-                raise ValidationError(self.error_message)
+                return False, ErrorRecord(self.code, self.error_message)
             else:
-                raise ValidationError(str(exc))
+                return False, ErrorRecord(self.code, str(exc))
+        except ValidationError as exc: # when `catch` doesn't include it
+            return False, exc.error_details
 
 class Assert(Filter):
 
-    def __init__(self, unary_test, error_message = _("Incorrect value.")):
+    code = 'invalid'
+
+    def __init__(self, unary_test, error_message = _("Incorrect value."), pure = False, code = None):
         self.unary_test = unary_test
         self.error_message = error_message
+        self.pure = pure
+        if code is not None:
+            self.code = code
 
-    def run(self, value):
-        if self.unary_test(value):
-            return value
-        else:
-            raise ValidationError(self.error_message)
+    def check(self, value):
+        try:
+            if self.unary_test(value):
+                return True, value
+        except ValidationError as exc:
+            return False, exc.error_details
+        return False, ErrorRecord(self.code, self.error_message)
 
 class In(Filter):
 
-    def __init__(self, collection, error_message = _("Incorrect value.")):
+    code = 'choice'
+    pure = True
+
+    def __init__(self, collection, error_message = _("Incorrect value."), code = None):
         self.collection = collection
         self.error_message = error_message
+        if code is not None:
+            self.code = code
 
-    def run(self, value):
+    def check(self, value):
         if value not in self.collection:
-            raise ValidationError(self.error_message)
-        return value
+            return False, ErrorRecord(self.code, self.error_message)
+        return True, value
 
 class Do(Filter):
 
@@ -605,24 +1482,31 @@ class Do(Filter):
 
     As you can see, it is possible to specify an error message.
     This error message will override any error message that could be triggered by 
-     the filters in the sequence.
+     the filters in the sequence. It's reported with the error code `code` ('invalid' by
+     default).
     """ 
 
+    code = 'invalid'
+
     def __init__(self, *filters, **kwargs):
-        error_message, = _get_kwargs(kwargs, (('error_message', None),))
+        error_message, code = _get_kwargs(kwargs, (('error_message', None), ('code', None)))
         self._filters = [to_filter(f) for f in filters]
         self.error_message = error_message
+        if code is not None:
+            self.code = code
 
-    def run(self, value):
+    @property
+    def pure(self):
+        return all(f.pure for f in self._filters)
+
+    def check(self, value):
         for f in self._filters:
-            try:
-                value = f.run(value)
-            except ValidationError:
+            ok, value = f.check(value)
+            if not ok:
                 if self.error_message:
-                    raise ValidationError(self.error_message)
-                else:
-                    raise
-        return value
+                    return False, ErrorRecord(self.code, self.error_message)
+                return False, value
+        return True, value
 
 class Each(Filter):
 
@@ -651,28 +1535,178 @@ class Each(Filter):
 
     >>> schema.validate({'keywords': ['PANCAKES', 'FOOD', 'Recipe']})
     {'keywords': ['pancakes', 'food', 'recipe']}
+
+    For very large lists or tuples, and an expensive filter, the items can be validated by
+     the threads or processes of an `executor` (from the `concurrent.futures` module), in chunks
+     of `chunksize` items. The filter is only given to the executor if there are more than
+     `chunksize` items. The result is the same as without executor (the error details are the
+     ones of the first invalid item), as long as the filter has no side effect.
+     With a `ProcessPoolExecutor`, the filter and the items must be picklable, and the filter
+     is pickled with every chunk, so the chunks should be large.
+
+    >>> executor = ProcessPoolExecutor(8)
+
+    >>> schema = Schema(['samples', Type(list), Each(Sample, executor = executor, chunksize = 5000)])
+
+    With `lazy = True`, `Each` accepts any iterable (like a generator), and returns a generator
+     validating the items one by one as they're consumed. An invalid item raises a
+     `ValidationError` when it's reached, with the error message translated in the language of
+     the current context (see `Settings.context`).
+
+    >>> for line in Each(Do(int, Range(0, 100)), lazy = True).validate(open('samples.txt')):
+            ...
+
+    With `collect_errors = True`, `Each` doesn't stop at the first invalid item: the error
+     details are a dictionary mapping the index of every invalid item to its error details
+     (the same as without `collect_errors`). The validation stops after `max_errors` errors,
+     so that a huge and wrong collection can't make the validation go on forever.
+     In fail fast mode (see `Schema`), only the first error is reported.
+
+    >>> Each(int, collect_errors = True).validate(['1', 'two', '3', 'four'])
+    ...
+    ValidationError: {1: 'Item #2: This should be an integer.', 3: 'Item #4: This should be an integer.'}
     """
 
     ITEM_START = 1
 
-    def __init__(self, filtr):
+    def __init__(self, filtr, executor = None, chunksize = 1000, lazy = False,
+                 collect_errors = False, max_errors = 100):
+        if executor is not None and lazy:
+            raise ValueError("Each can't use an executor in lazy mode.")
+        if collect_errors and lazy:
+            raise ValueError("Each can't collect the errors in lazy mode.")
+        if max_errors < 1:
+            raise ValueError("max_errors must be at least 1.")
         self._filter = to_filter(filtr)
+        self.executor = executor
+        self.chunksize = chunksize
+        self.lazy = lazy
+        self.collect_errors = collect_errors
+        self.max_errors = max_errors
 
-    def run(self, value):
-        result = []
-        for i, val in enumerate(value):
-            try:
-                result.append(self._filter.run(val))
-            except ValidationError as exc:
-                if isinstance(exc.error_details, dict):
-                    raise ValidationError({i : exc.error_details})
-                else:
-                    raise ValidationError(
-                        _("Item #%s: ") % (i + self.__class__.ITEM_START) + exc.error_details
-                    )
+    @property
+    def pure(self):
+        # a generator can only be consumed once, it can't be cached
+        return self._filter.pure and not self.lazy
+
+    def __getstate__(self):
+        # executors can't be pickled: the unpickled filter validates the items itself
+        state = self.__dict__.copy()
+        state['executor'] = None
+        return state
+
+    def check(self, value):
+        if self.lazy:
+            return True, self._iterate(value)
+        items = value if isinstance(value, (list, tuple)) else list(value)
+        max_errors = self._error_budget()
+        if self.executor is not None and len(items) > self.chunksize:
+            ok, result = self._check_chunks(items, max_errors)
+        else:
+            ok, result = _check_items(self._filter, items, max_errors)
+        if not ok:
+            return False, self._item_errors(result)
+        if result is value: # no item was transformed
+            return True, value
         if isinstance(value, (tuple, set)):
             result = type(value)(result)
-        return result
+        return True, result
+
+    def _error_budget(self):
+        # the number of invalid items after which the validation stops
+        if self.collect_errors and not _fail_fast.get():
+            return self.max_errors
+        return 1
+
+    def _check_chunks(self, value, max_errors):
+        chunksize = self.chunksize
+        chunks = [value[start:start + chunksize] for start in range(0, len(value), chunksize)]
+        context = _context_values()
+        futures = [
+            self.executor.submit(_check_items_in_context, context, self._filter, chunk, max_errors)
+            for chunk in chunks
+        ]
+        result = []
+        errors = []
+        transformed = False
+        for n, (chunk, future) in enumerate(zip(chunks, futures)):
+            ok, items = future.result()
+            if not ok:
+                errors.extend((n * chunksize + i, error_details) for i, error_details in items)
+                if len(errors) >= max_errors:
+                    for future in futures[n + 1:]:
+                        future.cancel()
+                    break
+            elif not errors:
+                # with a process pool, the items come back as copies
+                transformed = transformed or items is not chunk
+                result.extend(items)
+        if errors:
+            return False, errors[:max_errors]
+        return True, result if transformed else value
+
+    def _iterate(self, value):
+        check = self._filter.check
+        for i, item in enumerate(value):
+            ok, val = check(item)
+            if not ok:
+                raise ValidationError(self._item_error(i, val), settings.translator())
+            yield val
+
+    def _item_error(self, i, error_details, keyed = False):
+        """
+        Returns the error details of the invalid item at index `i`. With `keyed = True`, they
+         go in a dictionary under the key `i`, so the index isn't added to the path of the record.
+        """
+        if isinstance(error_details, dict):
+            return error_details if keyed else {i : error_details}
+        numbers = (i + self.__class__.ITEM_START,)
+        path = () if keyed else (i,)
+        if isinstance(error_details, ErrorRecord):
+            if isinstance(error_details, _ItemErrorRecord):
+                numbers += error_details.numbers
+            return _ItemErrorRecord(
+                error_details.code, error_details.template, error_details.params,
+                path + error_details.path, numbers
+            )
+        return _ItemErrorRecord(None, error_details, None, path, numbers)
+
+    def _item_errors(self, errors):
+        """
+        Returns the error details for a list of `(index, error_details)` pairs.
+        """
+        if not self.collect_errors:
+            return self._item_error(*errors[0])
+        return dict(
+            (i, self._item_error(i, error_details, keyed = True)) for i, error_details in errors
+        )
+
+def _check_items(filtr, items, max_errors = 1):
+    """
+    Checks the items of a list or tuple with `filtr`. Returns `(True, results)`, `results`
+     being `items` itself if no item was transformed, or `(False, errors)`, `errors` being
+     the list of the `(index, error_details)` pairs of the invalid items. The check stops
+     after `max_errors` invalid items.
+    """
+    check = filtr.check
+    result = None
+    errors = []
+    for i, item in enumerate(items):
+        ok, val = check(item)
+        if not ok:
+            errors.append((i, val))
+            if len(errors) >= max_errors:
+                break
+        elif errors:
+            continue
+        elif result is not None:
+            result.append(val)
+        elif val is not item:
+            result = list(items[:i])
+            result.append(val)
+    if errors:
+        return False, errors
+    return True, items if result is None else result
 
 class Each0(Each):
     """
@@ -682,6 +1716,158 @@ class Each0(Each):
 
 Each1 = Each
 
+_monotonic = getattr(time, 'monotonic', time.time)
+
+_profiled_check = None # set by naval.profiling while schemas are profiled
+
+_fail_fast = _ContextVar('naval_fail_fast', default = False) # True during a validation in fail fast mode
+
+def _failing_fast(check, value):
+    """
+    Calls `check(value)` in fail fast mode: the schemas stop at the first error.
+    """
+    if _fail_fast.get():
+        return check(value)
+    token = _fail_fast.set(True)
+    try:
+        return check(value)
+    finally:
+        _fail_fast.reset(token)
+
+# the context variables passed to the workers of the executors of `Each`
+_CONTEXT_VARS = (_context_lang, _context_locale_dir, _fail_fast)
+
+def _context_values():
+    return tuple(var.get() for var in _CONTEXT_VARS)
+
+def _check_items_in_context(context, filtr, items, max_errors):
+    """
+    Runs `_check_items` in a worker thread or process, with the values of the context variables
+     of the caller (returned by `_context_values`). The values are passed rather than a copy
+     of the context, since a context can't be sent to another process.
+    """
+    tokens = [var.set(value) for var, value in zip(_CONTEXT_VARS, context)]
+    try:
+        return _check_items(filtr, items, max_errors)
+    finally:
+        for var, token in reversed(list(zip(_CONTEXT_VARS, tokens))):
+            var.reset(token)
+
+class _LRUCache(object):
+    """
+    A thread safe mapping that keeps at most `maxsize` items, discarding the least recently used
+     ones first. If `ttl` is given, the items expire `ttl` seconds after being stored.
+    """
+
+    def __init__(self, maxsize, ttl = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key, default = None):
+        with self._lock:
+            try:
+                expires, value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= _monotonic():
+                del self._items[key]
+                self.misses += 1
+                return default
+            # move the item to the end (the most recently used)
+            del self._items[key]
+            self._items[key] = (expires, value)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires = _monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (expires, value)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last = False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getstate__(self):
+        return (self.maxsize, self.ttl) # the lock can't be pickled, and the items needn't be
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+class Cached(Filter):
+    """
+    Remembers the results of a filter, to avoid running it again and again on the same values.
+    Useful for filters that are expensive to run, if the same values are often validated:
+
+        >>> Username = Cached(Do(Type(str), Assert(is_registered_username)), maxsize = 10000)
+
+    Both the successes and the failures are remembered, with the untranslated error messages,
+     so that they can still be obtained in any language. The results obtained in fail fast mode
+     are remembered apart, since they can have fewer errors.
+    At most `maxsize` results are kept, the least recently used being discarded first.
+    If `ttl` is specified, a result is forgotten `ttl` seconds after it was computed.
+    Only the scalars (None, booleans, numbers and strings), and the tuples and frozensets of
+     them, are cached. The other values are just passed to the filter.
+
+    Only use `Cached` with filters that always give the same result for the same value,
+     and that return immutable values (or values that are never modified afterwards):
+     the same result object is returned every time.
+
+    The `hits` and `misses` attributes count how many times a result was found in the cache
+     or had to be computed. The thread safe cache can be shared by many threads.
+    """
+
+    _NOT_FOUND = object()
+
+    def __init__(self, filtr, maxsize = 128, ttl = None):
+        self._filter = to_filter(filtr)
+        self._cache = _LRUCache(maxsize, ttl)
+
+    @property
+    def pure(self):
+        return self._filter.pure
+
+    def check(self, value):
+        key = self._key(value)
+        if key is None:
+            return self._filter.check(value)
+        result = self._cache.get(key, self._NOT_FOUND)
+        if result is self._NOT_FOUND:
+            result = self._filter.check(value)
+            self._cache.set(key, result)
+        return result
+
+    def _key(self, value):
+        # the error details depend on the mode (the nested schemas stop at the first error
+        # in fail fast mode)
+        key = _typed_key(value)
+        return None if key is None else (key, _fail_fast.get())
+
+    @property
+    def hits(self):
+        return self._cache.hits
+
+    @property
+    def misses(self):
+        return self._cache.misses
+
+    def clear(self):
+        """
+        Empties the cache and resets the counters.
+        """
+        self._cache.clear()
+
 class Type(Filter):
     """
     Check a value's type.
@@ -704,12 +1890,18 @@ class Type(Filter):
 
         # This would allow all subclasses of basestring.
     """
+
+    pure = True
+
+    type_message = _("Wrong type. Expected {type}. Got {wrong_type} instead.")
+    types_message = _("Wrong type. Expected one of {types}. Got {wrong_type} instead.")
+
     def __init__(self, type_, *types, **kwargs):
         subclasses, = _get_kwargs(kwargs, (('subclasses', False),))
         self.types = (type_,) + tuple(types)
         self._subclasses = subclasses
     
-    def run(self, value):
+    def check(self, value):
         type_ = type(value)
         if (
             (self._subclasses and not (any (issubclass(type_, t) for t in self.types)))
@@ -718,20 +1910,14 @@ class Type(Filter):
         ):
             types_str = ', '.join(t.__name__ for t in self.types)
             if len(self.types) == 1:
-                raise ValidationError(
-                    _("Wrong type. Expected {type}. Got {wrong_type} instead.").format(
-                        type = types_str,
-                        wrong_type = type_.__name__
-                    )
+                return False, ErrorRecord(
+                    'type', self.type_message, {'type': types_str, 'wrong_type': type_.__name__}
                 )
             else:
-                raise ValidationError(
-                    _("Wrong type. Expected one of {types}. Got {wrong_type} instead.").format(
-                        types = types_str,
-                        wrong_type = type_.__name__
-                    )
+                return False, ErrorRecord(
+                    'type', self.types_message, {'types': types_str, 'wrong_type': type_.__name__}
                 )
-        return value
+        return True, value
 
 class Length(Filter):
 
@@ -769,6 +1955,8 @@ class Length(Filter):
         ) 
     """
 
+    pure = True
+
     empty_error = _("This value shouldn't be empty.")
     too_short_error = _("The value is too short. Min length is {min_length}.")
     too_long_error = _("The value is too long. Max length is {max_length}.")
@@ -785,22 +1973,20 @@ class Length(Filter):
         self.too_long_error = too_long_error or self.__class__.too_long_error
         self.exact_length_error = exact_length_error or self.__class__.exact_length_error
 
-    def run(self, value):
+    def check(self, value):
         l = len(value)
         if l < self.min:
             if l == 0:
-                raise ValidationError(self.empty_error)
+                return False, ErrorRecord('empty', self.empty_error)
             elif self.min == self.max:
-                raise ValidationError(self.exact_length_error.format(length = self.min))
+                return False, ErrorRecord('length', self.exact_length_error, {'length': self.min})
             else:
-                raise ValidationError(
-                    self.too_short_error.format(min_length = self.min)
-                )
+                return False, ErrorRecord('too_short', self.too_short_error, {'min_length': self.min})
         if self.max is not None and l > self.max:
             if self.min == self.max:
-                raise ValidationError(self.exact_length_error.format(length = self.min))
-            raise ValidationError(self.too_long_error.format(max_length = self.max))
-        return value        
+                return False, ErrorRecord('length', self.exact_length_error, {'length': self.min})
+            return False, ErrorRecord('too_long', self.too_long_error, {'max_length': self.max})
+        return True, value
 
 class Range(Filter):
     """
@@ -815,6 +2001,8 @@ class Range(Filter):
         )
     """
 
+    pure = True
+
     min_message = _("The minimum is {min}.")
     max_message = _("The maximum is {max}.")
 
@@ -824,18 +2012,107 @@ class Range(Filter):
         self.min_message = min_message or self.__class__.min_message
         self.max_message = max_message or self.__class__.max_message
 
-    def run(self, value):
+    def check(self, value):
         if self.min is not None:
             if value < self.min:
-                raise ValidationError(self.min_message.format(min = self.min))
+                return False, ErrorRecord('min', self.min_message, {'min': self.min})
         if self.max is not None:
             if value > self.max:
-                raise ValidationError(self.max_message.format(max = self.max))
-        return value
+                return False, ErrorRecord('max', self.max_message, {'max': self.max})
+        return True, value
+
+try:
+    from re import _parser as _sre_parse # python 3.11+
+except ImportError:
+    import sre_parse as _sre_parse
+
+def _regex_engine(name):
+    """
+    Returns the module implementing the regular expressions engine `name`:
+    're' (the standard library), 'regex' (https://pypi.org/project/regex/) or 're2'
+    (https://pypi.org/project/google-re2/, which runs in linear time).
+    """
+    if name == 're':
+        return re
+    if name not in ('regex', 're2'):
+        raise ValueError("Unknown regular expressions engine %r." % name)
+    try:
+        return __import__(name)
+    except ImportError:
+        raise ValueError(
+            "The regular expressions engine %r requires the %r module, which isn't installed."
+            % (name, name)
+        )
+
+def _pattern_bounds(pattern, flags):
+    """
+    Returns the minimum and maximum lengths of the strings matching `pattern` (the maximum
+     being None if there's no limit), and the literal prefix of these strings,
+     or None if that tells nothing about the strings.
+    """
+    if not isinstance(pattern, unicode):
+        return None
+    try:
+        parsed = _sre_parse.parse(pattern, flags)
+    except Exception: # a syntax specific to another engine
+        return None
+    min_length, max_length = parsed.getwidth()
+    if max_length >= _sre_parse.MAXREPEAT - 1:
+        max_length = None
+    prefix = ''
+    state = parsed.state if hasattr(parsed, 'state') else parsed.pattern # before python 3.8
+    if not state.flags & re.IGNORECASE:
+        for op, arg in parsed:
+            if op is _sre_parse.AT and arg is _sre_parse.AT_BEGINNING and not prefix:
+                continue
+            if op is not _sre_parse.LITERAL:
+                break
+            prefix += '%c' % arg
+    if not min_length and max_length is None and not prefix:
+        return None
+    return min_length, max_length, prefix
+
+# The most recently compiled patterns, shared by all the Regex filters (the same number as
+# in the cache of the re module)
+# {(engine, type of pattern, pattern, flags): (compiled pattern, fullmatch function, bounds)}
+_patterns = _LRUCache(512)
+
+def _compile_pattern(pattern, flags = 0, engine = 're'):
+    """
+    Compiles a pattern, or returns the already compiled pattern if it was compiled recently.
+    """
+    key = (engine, type(pattern), pattern, flags)
+    entry = _patterns.get(key)
+    if entry is not None:
+        return entry
+    module = _regex_engine(engine)
+    compiled = module.compile(pattern, flags)
+    fullmatch = getattr(compiled, 'fullmatch', None)
+    if fullmatch is None: # python 2
+        compiled = module.compile('(?:%s)\\Z' % pattern, flags)
+        fullmatch = compiled.match
+    entry = (compiled, fullmatch, _pattern_bounds(pattern, flags))
+    _patterns.set(key, entry)
+    return entry
+
+def _prefiltered(fullmatch, bounds):
+    min_length, max_length, prefix = bounds
+    def match(value):
+        if not isinstance(value, unicode):
+            return fullmatch(value) # the bounds are those of a unicode pattern
+        length = len(value)
+        if (
+            length < min_length
+            or (max_length is not None and length > max_length)
+            or not value.startswith(prefix)
+        ):
+            return None
+        return fullmatch(value)
+    return match
 
 class Regex(Filter):
     """
-    Regex filter
+    Regex filter. The whole value has to match the regular expression.
 
     Example:
     
@@ -847,23 +2124,61 @@ class Regex(Filter):
 
         >>> schema.validate({'username': "The-King"})
         {'username': 'The-King'}        
+
+    A pattern is compiled only once, even if it's used by many Regex filters.
+
+    Unless `prefilter` is False, the values that obviously don't match (because of their length,
+     or because they don't start with the literal characters the pattern starts with) are
+     rejected without running the regular expression.
+
+    The optional `engine` argument selects the regular expressions engine: 're' (the default),
+     'regex' (the third party "regex" module), or 're2' (Google's RE2, through the "google-re2"
+     module). RE2 runs in linear time, whatever the pattern and the value, which protects from
+     catastrophic backtracking. The module has to be installed.
+
+    A compiled regular expression can be given instead of a pattern. It's then used as is,
+     with its `match` method.
     """
 
-    def __init__(self, regex, flags = 0, error_message = _("Incorrect value.")):
+    code = 'pattern'
+    pure = True
+
+    def __init__(self, regex, flags = 0, error_message = _("Incorrect value."),
+     engine = 're', prefilter = True, code = None):
+        self.error_message = error_message
+        if code is not None:
+            self.code = code
+        self.engine = engine
+        self.prefilter = prefilter
+        self._setup(regex, flags)
+
+    def _setup(self, regex, flags):
+        self._source = regex
+        self.flags = flags
         if isinstance(regex, basestring):
-            if not regex.startswith('^'):
-                regex = '^' + regex
-            if not regex.endswith('$'):
-                regex = regex + '$'
-            self.regex = re.compile(regex, flags)
+            self.regex, fullmatch, bounds = _compile_pattern(regex, flags, self.engine)
+            if self.prefilter and bounds:
+                self.match = _prefiltered(fullmatch, bounds)
+            else:
+                self.match = fullmatch
         else:
-            self.regex = regex        
-        self.error_message = error_message
+            self.regex = regex
+            self.match = regex.match
 
-    def run(self, value):
-        if not self.regex.match(value):
-            raise ValidationError(self.error_message)
-        return value
+    def __getstate__(self):
+        # the match function can't be pickled, it's obtained again after unpickling
+        state = self.__dict__.copy()
+        del state['match'], state['regex']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._setup(self._source, self.flags)
+
+    def check(self, value):
+        if not self.match(value):
+            return False, ErrorRecord(self.code, self.error_message)
+        return True, value
 
 def to_filter(f):
     if isinstance(f, Filter):
@@ -879,8 +2194,8 @@ def to_filter(f):
     else:
         raise ValueError("%s is not a valid filter" % repr(f)) 
 
-ToInt = Apply(int, error_message = _("This should be an integer.")) # useful to get i18ned error messages
-ToFloat = Apply(float, error_message = _("This should be a number."))
+ToInt = Apply(int, error_message = _("This should be an integer."), pure = True, code = 'int') # useful to get i18ned error messages
+ToFloat = Apply(float, error_message = _("This should be a number."), pure = True, code = 'float')
 
 
 # function to extract named keyword arguments from **kwargs (required for Python 2
@@ -896,3 +2211,41 @@ def _get_kwargs(kwargs, defaults):
             )
         )
     return result
+
+_DICT_TYPE = Type(dict, subclasses = True) # used by Schema to check its input
+
+_SCALAR_TYPES = frozenset((type(None), bool, int, long, float, bytes, unicode, str))
+
+def _typed_key(value):
+    """
+    Returns a hashable key identifying a scalar, or a tuple or frozenset of scalars (at any
+     depth), or None for the other values. The types of all the values are part of the key,
+     since `(1, 2)`, `(1.0, 2.0)` and `(True, 2)` are equal but aren't validated alike.
+    """
+    t = type(value)
+    if t in _SCALAR_TYPES:
+        return t, value
+    if t is tuple or t is frozenset:
+        keys = []
+        for item in value:
+            key = _typed_key(item)
+            if key is None:
+                return None
+            keys.append(key)
+        return t, t(keys)
+    return None
+
+def _fingerprint(dict_):
+    """
+    Returns a hashable key identifying a dictionary, for the results cache of `Schema`,
+     or None if some values of the dictionary aren't scalars.
+    The types are part of the key, since 1, 1.0 and True are equal but aren't validated alike.
+    """
+    if type(dict_) not in (dict, collections.OrderedDict):
+        return None
+    items = []
+    for key, value in dict_.items():
+        if type(value) not in _SCALAR_TYPES:
+            return None
+        items.append((type(key), key, type(value), value))
+    return type(dict_), frozenset(items)
@@ -0,0 +1,472 @@
+"""
+Conversion of schemas to JSON Schema documents, and back.
+
+`to_json_schema` describes a schema with a JSON Schema document (draft 2020-12), that other
+tools (an API gateway, a form library...) can use to reject the obviously invalid data before
+it reaches Python:
+
+    >>> to_json_schema(Schema(
+            ['name', Type(str), Length(min=2, max=30)],
+            ['age', Optional, Type(int), Range(0, 150)]
+        ))
+    {'$schema': 'https://json-schema.org/draft/2020-12/schema', 'type': 'object',
+     'properties': {'name': {'type': 'string', 'minLength': 2, 'maxLength': 30},
+                    'age': {'type': 'integer', 'minimum': 0, 'maximum': 150}},
+     'required': ['name'], 'additionalProperties': False}
+
+`Type`, `Range`, `Length`, `Regex`, `In` (and the collections used as filters), `Each`, `Do`,
+`Cached`, nested schemas, `Optional`, `Default`, `Discard`, the unexpected keys policy, and
+`Email`, `Domain` and `Url` (as formats) are converted. The other filters (the functions of
+`Apply` and `Assert` for instance) can't be expressed: they're listed in the
+"x-naval-unsupported" keyword of the JSON Schema where they apply. The filters following a
+transformation in a chain (like `int` or `Apply`) are skipped too, as they don't see the input
+value. The document never rejects a value that the schema accepts, but it can accept values that
+the schema rejects. There's one exception: `In(range(...))` becomes an "integer" type, which
+rejects the booleans, although `True in range(2)` is true (True == 1). For the other collections,
+the booleans and the numbers that are equal (`True` and `1`, `False` and `0`) are all listed in
+the "enum", since they aren't equal in JSON Schema.
+
+The regular expressions are copied as they are: keep them to the syntax that Python and
+JavaScript share.
+
+`from_json_schema` builds a schema from a JSON Schema document. It understands the keywords that
+`to_json_schema` produces, and raises a ValueError for the other ones (and for the documents
+with "x-naval-unsupported" keywords, unless `ignore_unsupported` is True). The keywords specific
+to a JSON type (like "minLength" or "minimum") require that "type" is that type.
+"""
+
+from __future__ import unicode_literals
+import re
+from naval.core import (
+    Apply, Assert, Cached, DefaultVal, Delete, Discard, Do, Each, In, Length, MoveTo, Optional,
+    Range, Regex, Save, SaveAs, Schema, Type, Default
+)
+from past.builtins import basestring, long, unicode
+
+try:
+    _range = xrange # python 2
+except NameError:
+    _range = range
+
+__all__ = ['from_json_schema', 'to_json_schema']
+
+DIALECT = 'https://json-schema.org/draft/2020-12/schema'
+
+UNSUPPORTED = 'x-naval-unsupported'
+
+_JSON_TYPES = [
+    ((bool,), 'boolean'),
+    ((int, long), 'integer'),
+    ((float,), 'number'),
+    ((str, unicode, basestring), 'string'),
+    ((list, tuple), 'array'),
+    ((dict,), 'object'),
+    ((type(None),), 'null')
+]
+
+_LENGTH_KEYWORDS = {
+    'string': ('minLength', 'maxLength'),
+    'array': ('minItems', 'maxItems'),
+    'object': ('minProperties', 'maxProperties')
+}
+
+# the annotations, that don't constrain the values
+_ANNOTATIONS = frozenset([
+    '$schema', '$id', '$comment', 'title', 'description', 'examples', 'deprecated', 'readOnly',
+    'writeOnly'
+])
+
+def _is_json(value):
+    if value is None or isinstance(value, (bool, basestring)):
+        return True
+    if isinstance(value, (int, long, float)):
+        return value == value and value not in (float('inf'), float('-inf'))
+    if isinstance(value, (list, tuple)):
+        return all(_is_json(v) for v in value)
+    if isinstance(value, dict):
+        return all(isinstance(k, basestring) and _is_json(v) for k, v in value.items())
+    return False
+
+def _is_number(value):
+    return isinstance(value, (int, long, float)) and not isinstance(value, bool) and _is_json(value)
+
+def _describe(f):
+    if isinstance(f, Apply):
+        function = f.unary_function
+    elif isinstance(f, Assert):
+        function = f.unary_test
+    else:
+        return type(f).__name__
+    name = getattr(function, '__qualname__', None) or getattr(function, '__name__', repr(function))
+    return '%s(%s)' % (type(f).__name__, name)
+
+def _formats():
+    """
+    Returns the filters of naval.util, with the JSON Schemas of the values they accept.
+    """
+    from naval import util
+    email = {'type': 'string', 'format': 'email'}
+    domain = {'type': 'string', 'format': 'hostname'}
+    url = {'type': 'string', 'format': 'uri', 'maxLength': 2083}
+    return [
+        (util.Email, email), (util.Domain, domain), (util.Url, url),
+        (util.CachedEmail, email), (util.CachedDomain, domain), (util.CachedUrl, url)
+    ]
+
+
+# export
+
+def _merge(parts):
+    """
+    Merges JSON Schemas that must all be satisfied, with "allOf" when they use the same keywords.
+    """
+    result = {}
+    others = []
+    unsupported = []
+    for part in parts:
+        part = dict(part)
+        unsupported.extend(part.pop(UNSUPPORTED, ()))
+        if set(part) & set(result):
+            others.append(part)
+        else:
+            result.update(part)
+    if others:
+        result.setdefault('allOf', []).extend(others)
+    if unsupported:
+        result[UNSUPPORTED] = unsupported
+    return result
+
+def _transforms(f):
+    """
+    Tells whether the filter `f` may return something else than the value it checks.
+    """
+    if isinstance(f, (Type, Range, Length, Regex, In, Assert)):
+        return False
+    if isinstance(f, Do):
+        return any(_transforms(sub) for sub in f._filters)
+    if isinstance(f, (Each, Cached)):
+        return _transforms(f._filter)
+    if isinstance(f, Schema):
+        return f.unexpected_keys_policy == Schema.DELETE or any(
+            chain.discard or chain.default or chain.storage_instruction
+            or any(_transforms(sub) for sub in chain.filters)
+            for chain in f.chains
+        )
+    return True
+
+def _type_to_json(f):
+    names = []
+    for t in f.types:
+        for types, name in _JSON_TYPES:
+            if t in types or (
+                f._subclasses and isinstance(t, type) and any(issubclass(sub, t) for sub in types)
+            ):
+                if name not in names:
+                    names.append(name)
+    if not names or not f._subclasses and not all(
+        any(t in types for types, name in _JSON_TYPES) for t in f.types
+    ):
+        # some values of the other types can't be described
+        return {UNSUPPORTED: [
+            "Type(%s)" % ', '.join(getattr(t, '__name__', repr(t)) for t in f.types)
+        ]}
+    if 'number' in names and 'integer' in names:
+        names.remove('integer')
+    return {'type': names[0] if len(names) == 1 else names}
+
+def _filters_to_json(filters, formats):
+    """
+    Returns the JSON Schema of the values accepted by a sequence of filters.
+    """
+    parts = []
+    json_type = None
+    for i, f in enumerate(filters):
+        part = _filter_to_json(f, json_type, formats)
+        if isinstance(f, Type):
+            json_type = part.get('type')
+        parts.append(part)
+        if _transforms(f) and i + 1 < len(filters):
+            # the next filters check the transformed value
+            parts.append({UNSUPPORTED: ['filters after %s' % _describe(f)]})
+            break
+    return _merge(parts)
+
+def _filter_to_json(f, json_type, formats):
+    if id(f) in formats:
+        return dict(formats[id(f)])
+    cls = type(f)
+    if cls is Type:
+        return _type_to_json(f)
+    if cls is Range:
+        result = {}
+        for keyword, bound in (('minimum', f.min), ('maximum', f.max)):
+            if bound is None:
+                continue
+            if not _is_number(bound):
+                return {UNSUPPORTED: ['Range(%r, %r)' % (f.min, f.max)]}
+            result[keyword] = bound
+        return result
+    if cls is Length:
+        if json_type in _LENGTH_KEYWORDS:
+            pairs = [_LENGTH_KEYWORDS[json_type]]
+        else:
+            pairs = [_LENGTH_KEYWORDS[name] for name in ('string', 'array', 'object')]
+        result = {}
+        for min_keyword, max_keyword in pairs:
+            if f.min:
+                result[min_keyword] = f.min
+            if f.max is not None:
+                result[max_keyword] = f.max
+        return result
+    if cls is Regex:
+        source = f._source
+        flags = f.flags
+        if not isinstance(source, basestring):
+            source, flags = source.pattern, source.flags
+        if not isinstance(source, basestring) or flags & ~re.UNICODE:
+            return {UNSUPPORTED: ['Regex(%r)' % (source,)]}
+        return {'pattern': '^(?:%s)$' % source}
+    if cls is In:
+        collection = f.collection
+        # consecutive integers (the ranges of python 2 have no `step` attribute)
+        if isinstance(collection, _range) and (len(collection) < 2 or collection[1] - collection[0] == 1):
+            if len(collection) == 0:
+                return {'not': {}}
+            return {'type': 'integer', 'minimum': collection[0], 'maximum': collection[-1]}
+        if isinstance(collection, (list, tuple, set, frozenset)) and all(
+            _is_json(v) and not isinstance(v, (list, tuple, dict)) for v in collection
+        ):
+            return {'enum': _enum(collection)}
+        return {UNSUPPORTED: ['In(%r)' % (collection,)]}
+    if isinstance(f, Do):
+        return _filters_to_json(f._filters, formats)
+    if isinstance(f, Each):
+        # "items" only constrains arrays, while Each accepts any iterable
+        return {'items': _filter_to_json(f._filter, None, formats)}
+    if cls is Cached:
+        return _filter_to_json(f._filter, json_type, formats)
+    if cls is Schema:
+        return _schema_to_json(f, formats)
+    return {UNSUPPORTED: [_describe(f)]}
+
+def _enum(collection):
+    """
+    Returns the values of the JSON Schema "enum" matching the values of `collection`.
+    """
+    enum = list(collection)
+    for value in list(enum):
+        # the booleans and numbers equal for `in` (True and 1, False and 0.0...) aren't equal
+        # in JSON Schema: the missing ones are added
+        if isinstance(value, (bool, int, long, float)):
+            twin = int(value) if isinstance(value, bool) else bool(value)
+            if twin == value and not any(type(v) is type(twin) and v == twin for v in enum):
+                enum.append(twin)
+    return enum
+
+def _schema_to_json(schema, formats):
+    properties = {}
+    required = []
+    unsupported = []
+    written = set() # the fields that an earlier chain may have written
+    replaced = False # True once an earlier chain may have replaced the whole document
+    for chain in schema.chains:
+        storage = chain.storage_instruction
+        if not chain.field:
+            unsupported.append(
+                'chain without field: %s' % ', '.join(_describe(f) for f in chain.filters)
+            )
+            if type(storage) is SaveAs:
+                written.add(storage.name)
+            elif storage: # Save, or a custom storage instruction
+                replaced = True
+            continue
+        field = chain.field[0]
+        if replaced or field in written:
+            result = {UNSUPPORTED: ['chain of the computed field %r' % (field,)]}
+        else:
+            result = _filters_to_json(chain.filters, formats)
+            if isinstance(chain.default, DefaultVal) and _is_json(chain.default._val):
+                result['default'] = chain.default._val
+            if chain.discard:
+                discarded = [v for v in chain.discard if _is_json(v)]
+                if chain.optional or chain.default:
+                    result = {'anyOf': [{'enum': discarded}, result]}
+                else:
+                    result = _merge([{'not': {'enum': discarded}}, result])
+            if not (chain.optional or chain.default or field in required):
+                required.append(field)
+        properties[field] = _merge([properties[field], result]) if field in properties else result
+        # a default is stored in the document even without Save
+        if storage is Delete or chain.default or (
+            storage is Save and any(_transforms(f) for f in chain.filters)
+        ):
+            written.add(field)
+        if type(storage) in (SaveAs, MoveTo):
+            written.add(storage.name)
+            if type(storage) is MoveTo:
+                written.add(field)
+        elif storage and storage not in (Save, Delete): # custom, writing anything
+            replaced = True
+    result = {'type': 'object', 'properties': properties}
+    if required:
+        result['required'] = required
+    result['additionalProperties'] = schema.unexpected_keys_policy != Schema.FAIL
+    if unsupported:
+        result[UNSUPPORTED] = unsupported
+    return result
+
+def to_json_schema(schema):
+    """
+    Returns a JSON Schema document describing the values accepted by `schema` (a `Schema` or
+     any other filter).
+    """
+    result = {'$schema': DIALECT}
+    formats = dict((id(f), json_schema) for f, json_schema in _formats())
+    result.update(_filter_to_json(schema, None, formats))
+    return result
+
+
+# import
+
+def _check_type(document, keyword, types):
+    json_type = document.get('type')
+    if json_type not in types and not (isinstance(json_type, list) and set(json_type) <= set(types)):
+        raise ValueError(
+            "The JSON Schema keyword %r requires a type among %s." % (keyword, ', '.join(types))
+        )
+
+def _type_from_json(json_type):
+    types = []
+    for name in (json_type if isinstance(json_type, list) else [json_type]):
+        try:
+            types.extend({
+                'boolean': [bool], 'integer': [int], 'number': [int, float], 'string': [str],
+                'array': [list], 'object': [dict], 'null': [type(None)]
+            }[name])
+        except (KeyError, TypeError):
+            raise ValueError("Unknown JSON type %r." % (name,))
+    return Type(*sorted(set(types), key = types.index))
+
+def _filters_from_json(document, ignore_unsupported):
+    """
+    Returns the list of the filters checking the values described by `document`.
+    """
+    if not isinstance(document, dict):
+        raise ValueError("Can't convert the JSON Schema %r." % (document,))
+    keywords = set(document) - _ANNOTATIONS - set(['default'])
+    if UNSUPPORTED in keywords:
+        if not ignore_unsupported:
+            raise ValueError(
+                "The JSON Schema describes filters that can't be converted: %s."
+                % ', '.join(document[UNSUPPORTED])
+            )
+        keywords.discard(UNSUPPORTED)
+    filters = []
+    for f, json_schema in _formats():
+        if all(document.get(keyword) == value for keyword, value in json_schema.items()):
+            # the keywords are the ones of Email, Domain or Url
+            filters.append(f)
+            keywords -= set(json_schema)
+            break
+    if 'properties' in document or document.get('type') == 'object' and (
+        'required' in document or 'additionalProperties' in document
+    ):
+        _check_type(document, 'properties', ['object'])
+        filters.append(_schema_from_json(document, ignore_unsupported))
+        keywords -= set(['type', 'properties', 'required', 'additionalProperties'])
+    elif 'type' in keywords:
+        filters.append(_type_from_json(document['type']))
+        keywords.discard('type')
+    if 'enum' in document or 'const' in document:
+        values = document['enum'] if 'enum' in document else [document['const']]
+        filters.append(In(list(values))) # `in` compares with ==, so the arrays can stay lists
+        keywords -= set(['enum', 'const'])
+    if 'minimum' in document or 'maximum' in document:
+        _check_type(document, 'minimum', ['integer', 'number'])
+        filters.append(Range(document.get('minimum'), document.get('maximum')))
+        keywords -= set(['minimum', 'maximum'])
+    for json_type, (min_keyword, max_keyword) in sorted(_LENGTH_KEYWORDS.items()):
+        if min_keyword in keywords or max_keyword in keywords:
+            _check_type(document, min_keyword, [json_type])
+            filters.append(Length(
+                document.get(min_keyword, 0) if min_keyword in keywords else 0,
+                document.get(max_keyword) if max_keyword in keywords else None
+            ))
+            keywords -= set([min_keyword, max_keyword])
+    if 'pattern' in document:
+        _check_type(document, 'pattern', ['string'])
+        pattern = document['pattern']
+        match = re.match(r'^\^\(\?:(.*)\)\$$', pattern, re.DOTALL)
+        if match:
+            filters.append(Regex(match.group(1)))
+        else:
+            # a JSON Schema pattern can match any part of the string
+            filters.append(Regex('.*(?:%s).*' % pattern, re.DOTALL))
+        keywords.discard('pattern')
+    keywords.discard('format') # the other formats are only annotations
+    if 'items' in document:
+        _check_type(document, 'items', ['array'])
+        filters.append(Each(_one_filter(_filters_from_json(document['items'], ignore_unsupported))))
+        keywords.discard('items')
+    if 'allOf' in document:
+        for sub in document['allOf']:
+            filters.extend(_filters_from_json(sub, ignore_unsupported))
+        keywords.discard('allOf')
+    if keywords:
+        raise ValueError(
+            "Can't convert the JSON Schema keywords: %s." % ', '.join(sorted(keywords))
+        )
+    return filters
+
+def _chain_from_json(field, document, required, ignore_unsupported):
+    chain = [field]
+    if isinstance(document, dict) and 'anyOf' in document:
+        # the values discarded by an optional field, or a field with a default value
+        any_of = document['anyOf']
+        if not (
+            len(any_of) == 2 and set(any_of[0]) == set(['enum']) and len(document) == 1
+        ):
+            raise ValueError("Can't convert the JSON Schema keyword 'anyOf' of %r." % (field,))
+        chain.append(Discard(*any_of[0]['enum']))
+        document = any_of[1]
+    elif isinstance(document, dict) and 'not' in document:
+        discarded = document['not']
+        if set(discarded) != set(['enum']):
+            raise ValueError("Can't convert the JSON Schema keyword 'not' of %r." % (field,))
+        chain.append(Discard(*discarded['enum']))
+        document = dict((k, v) for k, v in document.items() if k != 'not')
+    if isinstance(document, dict) and 'default' in document:
+        chain.append(Default(document['default']))
+    elif not required:
+        chain.append(Optional)
+    chain.extend(_filters_from_json(document, ignore_unsupported))
+    return chain
+
+def _schema_from_json(document, ignore_unsupported):
+    required = document.get('required', [])
+    properties = document.get('properties', {})
+    chains = [
+        _chain_from_json(field, sub, field in required, ignore_unsupported)
+        for field, sub in properties.items()
+    ]
+    chains.extend([field] for field in required if field not in properties)
+    additional = document.get('additionalProperties', True)
+    if additional is False:
+        policy = Schema.FAIL
+    elif additional is True or additional == {}:
+        policy = Schema.KEEP
+    else:
+        raise ValueError("Can't convert the JSON Schema keyword 'additionalProperties'.")
+    return Schema(*chains, unexpected_keys = policy)
+
+def _one_filter(filters):
+    return filters[0] if len(filters) == 1 else Do(*filters)
+
+def from_json_schema(document, ignore_unsupported = False):
+    """
+    Returns a filter (a `Schema` for the JSON Schemas of objects) accepting the values that
+     `document` describes.
+    With `ignore_unsupported = True`, the filters that `to_json_schema` couldn't convert
+     are left out, rather than raising a ValueError.
+    """
+    return _one_filter(_filters_from_json(document, ignore_unsupported))
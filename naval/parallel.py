@@ -0,0 +1,118 @@
+"""
+Validation of large sets of documents with a pool of worker processes.
+
+    >>> from naval.parallel import validate_parallel
+
+    >>> for index, result in validate_parallel(address_schema, documents, workers = 4):
+            if isinstance(result, ValidationError):
+                print(index, result.error_details)
+
+The filter (usually a `Schema`) is pickled and sent to every worker process.
+The built-in filters can all be pickled, but the functions used in `Apply`, `Assert` or
+`Default` must be defined at module level: lambdas and nested functions can't be pickled.
+
+The documents are sent to the workers in chunks of `chunksize` documents. The results come
+back in the order of the documents, and at most a few chunks per worker are being processed
+at any time, so `documents` can be a generator over more data than would fit in memory.
+The workers send back the error records as they are: they are translated by the calling
+process, so their codes are kept.
+"""
+
+from __future__ import unicode_literals
+import collections, itertools, multiprocessing, pickle
+from naval.core import BatchValidation, Schema, settings
+
+__all__ = ['validate_parallel']
+
+# state of a worker process, set by _init_worker
+_worker = {}
+
+def _init_worker(payload):
+    _worker['check'] = pickle.loads(payload).check
+
+def _check_chunk(start, chunk):
+    check = _worker['check']
+    return [(index,) + check(value) for index, value in enumerate(chunk, start)]
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _picklable(obj):
+    try:
+        pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+def _dumps(filtr):
+    try:
+        return pickle.dumps(filtr, pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, AttributeError, TypeError) as exc:
+        location = ''
+        if isinstance(filtr, Schema):
+            for i, chain in enumerate(filtr.chains):
+                if not _picklable(chain):
+                    location = ' (in the chain #%d, %s)' % (
+                        i + 1,
+                        'field %r' % chain.field[0] if chain.field else 'global rule'
+                    )
+                    break
+        raise ValueError(
+            "Can't send the filter to the worker processes%s: %s. "
+            "Lambdas and nested functions used in Apply, Assert or Default can't be pickled, "
+            "use functions defined at module level instead." % (location, exc)
+        )
+
+def _results(payload, documents, workers, chunksize):
+    # multiprocessing.Pool rather than concurrent.futures.ProcessPoolExecutor, whose
+    # `initializer` argument requires python 3.7.
+    # The pool is terminated when the generator is closed (see BatchValidation.close).
+    pool = multiprocessing.Pool(workers, _init_worker, (payload,))
+    try:
+        pending = collections.deque()
+        start = 0
+        for chunk in _chunks(documents, chunksize):
+            pending.append(pool.apply_async(_check_chunk, (start, chunk)))
+            start += len(chunk)
+            if len(pending) >= 2 * workers:
+                for result in pending.popleft().get():
+                    yield result
+        while pending:
+            for result in pending.popleft().get():
+                yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def validate_parallel(
+    filtr, documents, workers = None, chunksize = 100, lang = None, on_error = 'collect'
+):
+    """
+    Validates every document of `documents` with `filtr`, using `workers` processes
+    (by default, as many as there are CPUs).
+    Returns a `BatchValidation` object, just like `Filter.validate_many`: an iterator over
+    `(index, result)` pairs, in the order of `documents`. The `lang` and `on_error` arguments
+    have the same meaning as for `Filter.validate_many`.
+
+    Raises a ValueError if `filtr` can't be pickled.
+
+    The worker processes run until the end of the iteration. If you may stop before (with
+    `break`, or an exception), close the iterator, for example with a `with` block:
+
+        >>> with validate_parallel(address_schema, documents) as batch:
+                for index, result in batch:
+                    ...
+    """
+    payload = _dumps(filtr)
+    workers = workers or multiprocessing.cpu_count()
+    return BatchValidation(
+        _results(payload, documents, workers, chunksize),
+        on_error,
+        settings.translator(lang)
+    )
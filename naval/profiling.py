@@ -0,0 +1,274 @@
+"""
+Profiling of schemas: which chains and which filters take time, and how often they fail.
+
+Profile a single schema (and the schemas nested in it) by creating it with `profile = True`.
+The statistics are collected in its `profile` attribute:
+
+    >>> user_schema = Schema(
+            ['name', Type(str), Length(max=100)],
+            ['address', address_schema],
+            profile = True
+        )
+
+    >>> user_schema.validate(user)
+
+    >>> user_schema.profile.to_dict()['chains']
+    {'name': {'calls': 1, 'failures': 0, 'seconds': 1.9e-06},
+     'address': {'calls': 1, 'failures': 0, 'seconds': 2.2e-05},
+     'address.street': {'calls': 1, 'failures': 0, 'seconds': 3.1e-06},
+     ...}
+
+Or profile all the schemas validated in a block of code (in any thread) with `instrument`:
+
+    >>> with naval.instrument() as profile:
+            handle_requests()
+
+    >>> print(profile.to_prometheus())
+
+The chains are identified by the path of their field, starting from the outermost schema
+(like 'address.street'). The chains without a field are named '*'. The filters are identified
+by the path of their chain and their position in the chain (like 'address.street[1]').
+The elements of a collection validated with `Each` share the same path.
+A chain is counted when its filters run: not when its field is missing, for example.
+
+Profiling makes validation slower: the chains are run by a generic implementation, rather
+than by the compiled function of a compiled schema, and results cached by a schema aren't used.
+When no schema is profiled, the cost of this feature is a single test per validated dictionary.
+"""
+
+from __future__ import unicode_literals
+import contextlib, threading, time, weakref
+from naval import core
+
+__all__ = ['Profile', 'instrument']
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+class _Stats(object):
+    __slots__ = ('calls', 'failures', 'seconds', 'label')
+
+    def __init__(self, label):
+        self.calls = self.failures = 0
+        self.seconds = 0.0
+        self.label = label
+
+    def to_dict(self):
+        return {'calls': self.calls, 'failures': self.failures, 'seconds': self.seconds}
+
+    # python 2 only pickles the classes with __slots__ that define these
+    def __getstate__(self):
+        return self.calls, self.failures, self.seconds, self.label
+
+    def __setstate__(self, state):
+        self.calls, self.failures, self.seconds, self.label = state
+
+class Profile(object):
+    """
+    Statistics collected while validating: for every chain and every filter, the number of
+    calls, the number of failures and the total time spent, in seconds.
+    A Profile can be updated by many threads at the same time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.chains = {}
+        self.filters = {}
+
+    def _record(self, table, key, label, seconds, failed):
+        with self._lock:
+            try:
+                stats = table[key]
+            except KeyError:
+                stats = table[key] = _Stats(label)
+            stats.calls += 1
+            stats.seconds += seconds
+            if failed:
+                stats.failures += 1
+
+    def reset(self):
+        with self._lock:
+            self.chains = {}
+            self.filters = {}
+
+    def to_dict(self):
+        """
+        Returns the statistics as a dictionary with the keys 'chains' and 'filters'.
+        The statistics of the filters also give the name of the class of the filter.
+        """
+        with self._lock:
+            chains = dict((path, stats.to_dict()) for path, stats in self.chains.items())
+            filters = {}
+            for path, stats in self.filters.items():
+                filters[path] = dict(stats.to_dict(), filter = stats.label)
+        return {'chains': chains, 'filters': filters}
+
+    def to_prometheus(self, prefix = 'naval'):
+        """
+        Returns the statistics in the text format of Prometheus.
+        """
+        data = self.to_dict()
+        lines = []
+        for kind, labels in (
+            ('chain', lambda path, stats: 'path="%s"' % _escape(path)),
+            ('filter', lambda path, stats: 'path="%s",filter="%s"' % (
+                _escape(path), _escape(stats['filter'])
+            ))
+        ):
+            table = data[kind + 's']
+            for metric, key, help in (
+                ('calls_total', 'calls', 'Number of times the %s was run.'),
+                ('failures_total', 'failures', 'Number of times the %s failed.'),
+                ('seconds_total', 'seconds', 'Time spent running the %s.')
+            ):
+                name = '%s_%s_%s' % (prefix, kind, metric)
+                lines.append('# HELP %s %s' % (name, help % kind))
+                lines.append('# TYPE %s counter' % name)
+                for path in sorted(table):
+                    stats = table[path]
+                    lines.append('%s{%s} %r' % (name, labels(path, stats), stats[key]))
+        return '\n'.join(lines) + '\n'
+
+    def __getstate__(self):
+        return {'chains': self.chains, 'filters': self.filters} # the lock can't be pickled
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.__dict__.update(state)
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# the profiles of the `instrument` blocks being executed
+_global_profiles = []
+# the number of validations of schemas created with `profile = True` being executed
+_profiled_validations = 0
+_global_lock = threading.Lock()
+
+def _update_hook():
+    # called with _global_lock held
+    if _global_profiles or _profiled_validations:
+        core._profiled_check = check
+    else:
+        core._profiled_check = None
+
+@contextlib.contextmanager
+def instrument(profile = None):
+    """
+    Context manager recording in `profile` (a new Profile by default) the statistics of all
+    the schemas validated in any thread while the block runs. Returns the profile.
+    """
+    profile = profile or Profile()
+    with _global_lock:
+        _global_profiles.append(profile)
+        _update_hook()
+    try:
+        yield profile
+    finally:
+        with _global_lock:
+            _global_profiles.remove(profile)
+            _update_hook()
+
+@contextlib.contextmanager
+def _profiled_validation():
+    # While a schema created with `profile = True` is validating, `Schema.check` calls the
+    # `check` function of this module, so that the nested schemas are profiled too.
+    global _profiled_validations
+    with _global_lock:
+        _profiled_validations += 1
+        _update_hook()
+    try:
+        yield
+    finally:
+        with _global_lock:
+            _profiled_validations -= 1
+            _update_hook()
+
+# the validation being profiled in the current thread: (profiles, path of the current chain)
+_current = threading.local()
+
+def check(schema, dict_):
+    """
+    Version of `Schema.check` recording statistics. It's the `check` method of the schemas
+    created with `profile = True`, and the one of all the schemas while some are profiled.
+    """
+    outer = getattr(_current, 'frame', None)
+    if outer is not None:
+        return _check(schema, dict_, *outer)
+    profiles = list(_global_profiles)
+    if schema.profile is None:
+        if not profiles:
+            if schema._cache is not None:
+                return schema._cached_check(dict_)
+            return schema._check(dict_)
+        return _check(schema, dict_, profiles, '')
+    profiles.append(schema.profile)
+    with _profiled_validation():
+        return _check(schema, dict_, profiles, '')
+
+def _check(schema, dict_, profiles, prefix):
+    outer = getattr(_current, 'frame', None)
+    _current.frame = (profiles, prefix)
+    try:
+        return schema._check(dict_, _profiled_chains(schema, prefix))
+    finally:
+        _current.frame = outer
+
+def _record(profiles, table, key, label, seconds, failed):
+    for profile in profiles:
+        profile._record(getattr(profile, table), key, label, seconds, failed)
+
+class _TimedFilters(object):
+    """
+    Runs the filters of a chain, recording the statistics of the chain and of its filters in
+    the profiles of the current validation.
+    """
+
+    def __init__(self, filters, path):
+        self.filters = filters
+        self.path = path
+        self.filter_paths = ['%s[%d]' % (path, position) for position in range(len(filters))]
+
+    def check(self, value):
+        frame = _current.frame
+        profiles = frame[0]
+        clock = _clock
+        start = clock()
+        _current.frame = (profiles, self.path + '.')
+        ok = True
+        try:
+            for f, path in zip(self.filters, self.filter_paths):
+                filter_start = clock()
+                ok, value = f.check(value)
+                _record(profiles, 'filters', path, type(f).__name__, clock() - filter_start, not ok)
+                if not ok:
+                    break
+        finally:
+            _current.frame = frame
+        _record(profiles, 'chains', self.path, None, clock() - start, not ok)
+        return ok, value
+
+class _ProfiledChain(object):
+    """
+    Chain run by `Schema._check` in place of `chain`: the same, with timed filters.
+    """
+
+    def __init__(self, chain, prefix):
+        self.field = chain.field
+        self.discard = chain.discard
+        self.optional = chain.optional
+        self.default = chain.default
+        self.storage_instruction = chain.storage_instruction
+        path = prefix + ('%s' % chain.field[0] if chain.field else '*')
+        self.filters = (_TimedFilters(chain.filters, path),)
+
+# for every schema profiled, its profiled chains by path prefix
+_chains = weakref.WeakKeyDictionary()
+
+def _profiled_chains(schema, prefix):
+    try:
+        return _chains[schema][prefix]
+    except KeyError:
+        chains = [_ProfiledChain(chain, prefix) for chain in schema.chains]
+        _chains.setdefault(schema, {})[prefix] = chains
+        return chains
@@ -0,0 +1,497 @@
+"""
+Serialization of schemas.
+
+`Schema.to_spec` describes a schema with JSON compatible data (dictionaries, lists, strings,
+numbers, booleans and None), and `Schema.from_spec` builds the schema back from the description.
+Specs can be stored in files or sent to other processes:
+
+    >>> spec = address_schema.to_spec()
+
+    >>> spec['chains'][0]
+    {'field': 'house number', 'filters': [{'filter': 'Type', 'types': ['int']},
+     {'filter': 'Range', 'min': 1, 'max': 10000}]}
+
+    >>> address_schema = Schema.from_spec(json.loads(json.dumps(spec)))
+
+All the filters and storage instructions of naval are supported. The functions (of `Apply`,
+`Assert` and `Default`), the types (of `Type`) and the exceptions (caught by `Apply`) are
+referenced by their importable dotted name, like 'decimal.Decimal' or 'myapp.checks.is_free'
+(just 'int' or 'str.lower' for the builtins): lambdas and nested functions can't be serialized.
+The filters that are module level objects of naval (like `Email`) are referenced by name too,
+as are the instances of other filter classes, if they're module level objects of the module
+defining their class. The values (field names, values of `Discard`, `Default`, `In` and `Range`)
+have to be JSON compatible.
+
+Building a schema from a spec imports the modules it references, and the functions it references
+are called when validating: only use specs from trusted sources.
+
+`dumps` and `loads` serialize a schema in a binary form, for caches (the data can only be loaded
+by the same version of Python). A compiled schema is saved with the code of its generated
+functions, so that loading it is much faster than compiling it again:
+
+    >>> with open('address_schema.cache', 'wb') as fd:
+            fd.write(dumps(address_schema))
+
+    >>> with open('address_schema.cache', 'rb') as fd:
+            address_schema = loads(fd.read())
+"""
+
+from __future__ import unicode_literals
+import importlib, io, marshal, pickle, sys
+from postpone import LazyString, StringLike
+from naval import compiler, core
+from naval.core import (
+    Apply, Assert, Cached, DefaultFunc, DefaultVal, Delete, Discard, Do, Each, Each0, Filter, In,
+    Length, MoveTo, Optional, Range, Regex, Save, SaveAs, Schema, Type
+)
+from past.builtins import basestring, long
+
+try:
+    import __builtin__ as _builtins # python 2
+except ImportError:
+    import builtins as _builtins
+
+try:
+    from importlib.util import MAGIC_NUMBER as _MAGIC_NUMBER
+except ImportError: # python 2
+    import imp
+    _MAGIC_NUMBER = imp.get_magic()
+
+__all__ = ['dumps', 'from_spec', 'loads', 'to_spec']
+
+_POLICIES = {Schema.FAIL: 'fail', Schema.KEEP: 'keep', Schema.DELETE: 'delete'}
+_POLICY_NAMES = dict((name, policy) for policy, name in _POLICIES.items())
+
+_INCORRECT_VALUE = "Incorrect value."
+
+
+# references to python objects
+
+def _resolve(name):
+    """
+    Returns the object named `name`: a dotted name starting with the name of a module,
+    or the name of a builtin.
+    """
+    parts = name.split('.')
+    obj = None
+    for i in range(len(parts) - 1, 0, -1):
+        try:
+            obj = importlib.import_module('.'.join(parts[:i]))
+        except ImportError:
+            continue
+        break
+    if obj is None:
+        obj, i = _builtins, 0
+    try:
+        for attr in parts[i:]:
+            obj = getattr(obj, attr)
+    except AttributeError:
+        raise ValueError("Can't find %r." % name)
+    return obj
+
+def _reference(obj):
+    """
+    Returns the dotted name of a function, a method or a class.
+    """
+    module = getattr(obj, '__module__', None)
+    if module is None: # method of a builtin type, like str.lower
+        module = getattr(getattr(obj, '__objclass__', None), '__module__', None)
+    qualname = getattr(obj, '__qualname__', None)
+    if qualname is None: # python 2
+        cls = getattr(obj, '__objclass__', None) or getattr(obj, 'im_class', None)
+        qualname = getattr(obj, '__name__', None)
+        if cls is not None and qualname is not None:
+            qualname = '%s.%s' % (cls.__name__, qualname)
+    if module is None or qualname is None:
+        raise ValueError("%r can't be referenced by name." % (obj,))
+    name = qualname if module in ('builtins', '__builtin__') else '%s.%s' % (module, qualname)
+    try:
+        found = _resolve(name)
+    except (ValueError, ImportError):
+        found = None
+    if found is not obj and found != obj: # the same method of a class is a new object every time
+        raise ValueError(
+            "%r can't be referenced by name: only the module level functions and classes "
+            "can be serialized." % (obj,)
+        )
+    return name
+
+_named_filters = None
+
+def _filter_reference(f):
+    """
+    Returns the dotted name of a filter or a storage instruction that is a module level object of
+    naval, or of the module defining its class. Returns None if there's none.
+    """
+    global _named_filters
+    if _named_filters is None:
+        from naval import util
+        _named_filters = {}
+        for module in (util, core):
+            for name, obj in vars(module).items():
+                if isinstance(obj, Filter) and not name.startswith('_'):
+                    _named_filters.setdefault(id(obj), (obj, '%s.%s' % (module.__name__, name)))
+    try:
+        return _named_filters[id(f)][1]
+    except KeyError:
+        pass
+    module = sys.modules.get(type(f).__module__)
+    if module is not None and not module.__name__.startswith('naval.'):
+        for name, obj in vars(module).items():
+            if obj is f:
+                return '%s.%s' % (module.__name__, name)
+    return None
+
+
+# values and messages
+
+def _value(value):
+    if value is None or isinstance(value, (bool, int, long, float, basestring)):
+        return value
+    if isinstance(value, list):
+        return [_value(v) for v in value]
+    if isinstance(value, dict) and all(isinstance(key, basestring) for key in value):
+        return dict((key, _value(v)) for key, v in value.items())
+    raise ValueError("%r can't be serialized: it isn't JSON compatible." % (value,))
+
+def _message_to_spec(message):
+    if isinstance(message, LazyString):
+        return {'translate': _text(message)}
+    if isinstance(message, StringLike):
+        raise ValueError(
+            "Can't serialize a formatted message. Use the {placeholders} of the messages instead."
+        )
+    return message
+
+def _message_from_spec(spec):
+    if isinstance(spec, dict):
+        return LazyString(spec['translate'])
+    return spec
+
+def _text(message):
+    return message.eval(lambda text: text) if isinstance(message, LazyString) else None
+
+def _messages(spec, f, names, default_text = None):
+    """
+    Adds the error messages of `f` named `names` to the spec, if they aren't the default ones.
+    """
+    for name in names:
+        message = getattr(f, name)
+        if message is None:
+            continue
+        text = _text(message)
+        if text is not None and text == (_text(getattr(type(f), name, None)) or default_text):
+            continue
+        spec[name] = _message_to_spec(message)
+    return spec
+
+def _code(spec, f):
+    """
+    Adds the error code of `f` to the spec, if it isn't the default one of its class.
+    """
+    if f.code != type(f).code:
+        spec['code'] = f.code
+    return spec
+
+def _with_messages(spec, kwargs, names):
+    for name in names:
+        if name in spec:
+            kwargs[name] = _message_from_spec(spec[name])
+    if 'code' in spec:
+        kwargs['code'] = spec['code']
+    return kwargs
+
+
+# filters
+
+def _filter_to_spec(f):
+    name = _filter_reference(f)
+    if name is not None:
+        return {'ref': name}
+    cls = type(f)
+    if cls is Schema:
+        return to_spec(f)
+    if cls is Type:
+        spec = {'filter': 'Type', 'types': [_reference(t) for t in f.types]}
+        if f._subclasses:
+            spec['subclasses'] = True
+        return spec
+    if cls is Length:
+        spec = {'filter': 'Length', 'min': f.min, 'max': f.max}
+        return _messages(
+            spec, f, ('empty_error', 'too_short_error', 'too_long_error', 'exact_length_error')
+        )
+    if cls is Range:
+        spec = {'filter': 'Range', 'min': _value(f.min), 'max': _value(f.max)}
+        return _messages(spec, f, ('min_message', 'max_message'))
+    if cls is In:
+        collection = type(f.collection)
+        if collection not in (list, tuple, set, frozenset):
+            raise ValueError("Can't serialize In(%r): use a list, tuple or set." % (f.collection,))
+        spec = {
+            'filter': 'In', 'values': [_value(v) for v in f.collection],
+            'collection': collection.__name__
+        }
+        return _code(_messages(spec, f, ('error_message',), _INCORRECT_VALUE), f)
+    if cls is Regex:
+        source = f._source
+        spec = {'filter': 'Regex'}
+        flags = f.flags
+        if isinstance(source, basestring):
+            spec['pattern'] = source
+        else:
+            spec['compiled'] = source.pattern
+            flags = source.flags
+        if flags:
+            spec['flags'] = flags
+        if f.engine != 're':
+            spec['engine'] = f.engine
+        if not f.prefilter:
+            spec['prefilter'] = False
+        return _code(_messages(spec, f, ('error_message',), _INCORRECT_VALUE), f)
+    if cls is Do:
+        spec = {'filter': 'Do', 'filters': [_filter_to_spec(sub) for sub in f._filters]}
+        return _code(_messages(spec, f, ('error_message',)), f)
+    if cls in (Each, Each0):
+        if f.executor is not None:
+            raise ValueError("Can't serialize an Each filter using an executor.")
+        spec = {'filter': cls.__name__, 'of': _filter_to_spec(f._filter)}
+        if f.lazy:
+            spec['lazy'] = True
+        if f.collect_errors:
+            spec['collect_errors'] = True
+            spec['max_errors'] = f.max_errors
+        return spec
+    if cls is Cached:
+        spec = {'filter': 'Cached', 'of': _filter_to_spec(f._filter), 'maxsize': f._cache.maxsize}
+        if f._cache.ttl is not None:
+            spec['ttl'] = f._cache.ttl
+        return spec
+    if isinstance(f, (Apply, Assert)) and cls.__module__ in ('naval.core', 'naval.aio'):
+        function = f.unary_function if isinstance(f, Apply) else f.unary_test
+        spec = {'filter': cls.__name__, 'function': _reference(function)}
+        if isinstance(f, Apply) and tuple(f.catch) != (Exception,):
+            spec['catch'] = [_reference(exc) for exc in f.catch]
+        if f.pure:
+            spec['pure'] = True
+        return _code(_messages(
+            spec, f, ('error_message',), None if isinstance(f, Apply) else _INCORRECT_VALUE
+        ), f)
+    raise ValueError(
+        "Can't serialize the filter %r: it's not a filter of naval, nor a module level object." % (f,)
+    )
+
+def _filter_class(name):
+    if name in ('AsyncApply', 'AsyncAssert'):
+        from naval import aio
+        return getattr(aio, name)
+    cls = getattr(core, name, None)
+    if not (isinstance(cls, type) and issubclass(cls, Filter)):
+        raise ValueError("Unknown filter %r." % name)
+    return cls
+
+def _filter_from_spec(spec):
+    if 'ref' in spec:
+        return _resolve(spec['ref'])
+    name = spec['filter']
+    cls = _filter_class(name)
+    if cls is Schema:
+        return from_spec(spec)
+    if cls is Type:
+        return Type(*[_resolve(t) for t in spec['types']], subclasses = spec.get('subclasses', False))
+    if cls is Length:
+        return Length(spec.get('min', 0), spec.get('max'), **_with_messages(
+            spec, {}, ('empty_error', 'too_short_error', 'too_long_error', 'exact_length_error')
+        ))
+    if cls is Range:
+        return Range(spec.get('min'), spec.get('max'), **_with_messages(
+            spec, {}, ('min_message', 'max_message')
+        ))
+    if cls is In:
+        collection = {'list': list, 'tuple': tuple, 'set': set, 'frozenset': frozenset}[
+            spec.get('collection', 'list')
+        ]
+        return In(collection(spec['values']), **_with_messages(spec, {}, ('error_message',)))
+    if cls is Regex:
+        kwargs = _with_messages(spec, {}, ('error_message',))
+        if 'compiled' in spec:
+            regex = core._regex_engine(spec.get('engine', 're')).compile(
+                spec['compiled'], spec.get('flags', 0)
+            )
+            return Regex(regex, **kwargs)
+        return Regex(
+            spec['pattern'], spec.get('flags', 0), engine = spec.get('engine', 're'),
+            prefilter = spec.get('prefilter', True), **kwargs
+        )
+    if cls is Do:
+        return Do(
+            *[_filter_from_spec(sub) for sub in spec['filters']],
+            **_with_messages(spec, {}, ('error_message',))
+        )
+    if cls in (Each, Each0):
+        return cls(
+            _filter_from_spec(spec['of']),
+            lazy = spec.get('lazy', False),
+            collect_errors = spec.get('collect_errors', False),
+            max_errors = spec.get('max_errors', 100)
+        )
+    if cls is Cached:
+        return Cached(_filter_from_spec(spec['of']), spec.get('maxsize', 128), spec.get('ttl'))
+    if issubclass(cls, (Apply, Assert)):
+        kwargs = _with_messages(spec, {'pure': spec.get('pure', False)}, ('error_message',))
+        if 'catch' in spec:
+            kwargs['catch'] = tuple(_resolve(exc) for exc in spec['catch'])
+        return cls(_resolve(spec['function']), **kwargs)
+    raise ValueError("Filter %r can't be built from a spec." % name)
+
+
+# chains and schemas
+
+def _storage_to_spec(storage):
+    if storage is Save:
+        return {'instruction': 'Save'}
+    if storage is Delete:
+        return {'instruction': 'Delete'}
+    if type(storage) in (SaveAs, MoveTo):
+        return {'instruction': type(storage).__name__, 'name': _value(storage.name)}
+    name = _filter_reference(storage)
+    if name is None:
+        raise ValueError(
+            "Can't serialize the storage instruction %r: it's not a module level object." % (storage,)
+        )
+    return {'ref': name}
+
+def _storage_from_spec(spec):
+    if 'ref' in spec:
+        return _resolve(spec['ref'])
+    instruction = spec['instruction']
+    if instruction == 'Save':
+        return Save
+    if instruction == 'Delete':
+        return Delete
+    if instruction == 'SaveAs':
+        return SaveAs(spec['name'])
+    if instruction == 'MoveTo':
+        return MoveTo(spec['name'])
+    raise ValueError("Unknown storage instruction %r." % instruction)
+
+def _chain_to_spec(chain):
+    spec = {}
+    if chain.field:
+        spec['field'] = _value(chain.field[0])
+    if chain.discard:
+        spec['discard'] = [_value(v) for v in chain.discard]
+    if chain.optional:
+        spec['optional'] = True
+    if isinstance(chain.default, DefaultFunc):
+        spec['default'] = {'function': _reference(chain.default._val)}
+        if chain.default.pure:
+            spec['default']['pure'] = True
+    elif isinstance(chain.default, DefaultVal):
+        spec['default'] = {'value': _value(chain.default._val)}
+    if chain.filters:
+        spec['filters'] = [_filter_to_spec(f) for f in chain.filters]
+    if chain.storage_instruction:
+        spec['storage'] = _storage_to_spec(chain.storage_instruction)
+    return spec
+
+def _chain_from_spec(spec):
+    instructions = []
+    if 'field' in spec:
+        instructions.append(spec['field'])
+        if 'discard' in spec:
+            instructions.append(Discard(*spec['discard']))
+        if spec.get('optional'):
+            instructions.append(Optional)
+        default = spec.get('default')
+        if default is not None:
+            if 'function' in default:
+                instructions.append(DefaultFunc(_resolve(default['function']), default.get('pure', False)))
+            else:
+                instructions.append(DefaultVal(default['value']))
+    instructions.extend(_filter_from_spec(f) for f in spec.get('filters', ()))
+    if 'storage' in spec:
+        instructions.append(_storage_from_spec(spec['storage']))
+    return instructions
+
+def to_spec(schema):
+    """
+    Returns a JSON compatible description of `schema`.
+    Raises a ValueError if some part of the schema can't be described.
+    """
+    spec = {'filter': 'Schema', 'chains': [_chain_to_spec(chain) for chain in schema.chains]}
+    if schema.unexpected_keys_policy != Schema.FAIL:
+        spec['unexpected_keys'] = _POLICIES[schema.unexpected_keys_policy]
+    for name in ('max_concurrency', 'fail_fast', 'read_only'):
+        if getattr(schema, name):
+            spec[name] = getattr(schema, name)
+    if schema._cache is not None:
+        spec['cache'] = schema._cache.maxsize
+    if schema._compiled_check is not None:
+        spec['compiled'] = True
+    return spec
+
+def from_spec(spec):
+    """
+    Builds a schema from its description, as returned by `to_spec`.
+    """
+    schema = Schema(
+        *[_chain_from_spec(chain) for chain in spec['chains']],
+        unexpected_keys = _POLICY_NAMES[spec.get('unexpected_keys', 'fail')],
+        max_concurrency = spec.get('max_concurrency'),
+        cache = spec.get('cache'),
+        fail_fast = spec.get('fail_fast', False),
+        read_only = spec.get('read_only', False)
+    )
+    if spec.get('compiled'):
+        schema.compile()
+    return schema
+
+
+# binary form
+
+_FORMAT = 1
+
+_METHOD_DESCRIPTOR = type(str.lower)
+
+class _Pickler(pickle.Pickler):
+    # the named filters (like Email) are saved by name, so that they're shared after loading
+    # and so are the methods of the builtin types (like str.lower), that python 2 can't pickle
+    def persistent_id(self, obj):
+        if isinstance(obj, Filter):
+            return _filter_reference(obj)
+        if isinstance(obj, _METHOD_DESCRIPTOR):
+            return _reference(obj)
+        return None
+
+class _Unpickler(pickle.Unpickler):
+    def persistent_load(self, name):
+        return _resolve(name)
+
+def dumps(schema):
+    """
+    Returns `schema` serialized as bytes, with the code of its generated functions if it's compiled.
+    """
+    codes = compiler._compiled_codes(schema, {})
+    # the code objects can only be loaded by a python using the same bytecode
+    header = (
+        _FORMAT, _MAGIC_NUMBER, dict((key, marshal.dumps(code)) for key, code in codes.items())
+    )
+    stream = io.BytesIO()
+    pickle.dump(header, stream, 2)
+    _Pickler(stream, 2).dump(schema)
+    return stream.getvalue()
+
+def loads(data):
+    """
+    Returns the schema serialized by `dumps`.
+    """
+    stream = io.BytesIO(data)
+    format, magic_number, codes = pickle.load(stream)
+    if format != _FORMAT:
+        raise ValueError("Unsupported format of serialized schema.")
+    if magic_number == _MAGIC_NUMBER:
+        # registered before unpickling the schema, which compiles it
+        for key, code in codes.items():
+            compiler._codes.setdefault(key, marshal.loads(code))
+    return _Unpickler(stream).load()
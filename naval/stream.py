@@ -0,0 +1,127 @@
+"""
+Validation of JSON Lines (NDJSON) streams: one JSON document per line.
+
+    >>> from naval.stream import validate_stream
+
+    >>> with open('users.jsonl', 'rb') as infile, open('valid.jsonl', 'w') as valid, \\
+                open('errors.jsonl', 'w') as errors:
+            stats = validate_stream(user_schema, infile, valid, errors)
+
+    >>> print(stats)
+    1000000 records (999120 valid, 880 invalid) in 12.3s: 81300 records/s
+
+The documents are read and validated one line at a time, so the memory used doesn't depend
+on the size of the input. The validated documents (as returned by `validate`) are written to
+the `valid` output, one per line. For every invalid line, a JSON object like
+
+    {"line": 12, "errors": {"email": "This is not a valid email address."}}
+
+is written to the `errors` output. Lines that aren't valid JSON (or valid UTF-8) are reported
+the same way.
+
+The same functionality is available from the command line:
+
+    $ python -m naval myapp.schemas:user_schema users.jsonl -o valid.jsonl -e errors.jsonl
+"""
+
+from __future__ import unicode_literals
+from past.builtins import unicode
+import importlib, io, json, time
+from naval.core import evalr, settings
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+__all__ = ['StreamStats', 'load_schema', 'open_input', 'validate_stream']
+
+BUFFER_SIZE = 1 << 20
+
+def load_schema(path):
+    """
+    Imports a schema (or any filter) given its location as 'package.module:name'.
+    """
+    module_name, sep, name = path.partition(':')
+    if not sep or not name:
+        raise ValueError("Expected a location like 'package.module:name', got %r." % path)
+    obj = importlib.import_module(module_name)
+    for attr in name.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+def open_input(path, buffer_size = BUFFER_SIZE):
+    """
+    Opens a file for reading, in binary mode, with a large buffer.
+    """
+    return io.open(path, 'rb', buffering = buffer_size)
+
+class StreamStats(object):
+    """
+    Statistics returned by `validate_stream`.
+    """
+
+    def __init__(self):
+        self.total = self.valid = self.invalid = 0
+        self.elapsed = 0.0
+
+    @property
+    def records_per_second(self):
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return "%d records (%d valid, %d invalid) in %.1fs: %d records/s" % (
+            self.total, self.valid, self.invalid, self.elapsed, self.records_per_second
+        )
+
+def _json_default(obj):
+    # the read only views returned by the schemas created with `read_only = True`
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError("%r is not JSON serializable" % (obj,))
+
+def _write_line(output, obj):
+    # unicode: on python 2, json.dumps returns a str when the output is ASCII
+    output.write(unicode(json.dumps(obj, ensure_ascii = False, default = _json_default)))
+    output.write('\n')
+
+def validate_stream(filtr, infile, valid = None, errors = None, lang = None):
+    """
+    Validates every line of `infile` (a file object, in binary or text mode) with `filtr`.
+    The validated documents are written to `valid`, and the errors to `errors`
+    (two file objects open in text mode). Either of them can be None.
+    The blank lines are ignored.
+
+    Returns a StreamStats object.
+    """
+    check = filtr.check
+    translate_message = settings.translator(lang)
+    stats = StreamStats()
+    start = time.time()
+    for line_number, line in enumerate(infile, 1):
+        if not line.strip():
+            continue
+        stats.total += 1
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            document = json.loads(line)
+        except UnicodeDecodeError as exc:
+            ok, result = False, "Invalid UTF-8: %s" % exc
+        except ValueError as exc:
+            ok, result = False, "Invalid JSON: %s" % exc
+        else:
+            ok, result = check(document)
+        if ok:
+            stats.valid += 1
+            if valid is not None:
+                _write_line(valid, result)
+        else:
+            stats.invalid += 1
+            if errors is not None:
+                _write_line(
+                    errors,
+                    {'line': line_number, 'errors': evalr(result, translate_message)}
+                )
+    stats.elapsed = time.time() - start
+    return stats
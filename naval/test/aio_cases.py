@@ -0,0 +1,146 @@
+"""
+Tests of the asyncio support. They use the `async` syntax, so they're imported by test_aio.py
+only on Python 3.5 or later.
+"""
+
+from naval import *
+from naval.aio import validate_async
+from naval.core import settings
+import asyncio, sys, types, unittest
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class AsyncTest(unittest.TestCase):
+
+    def test_validate_async(self):
+        from naval.aio import AsyncApply, AsyncAssert
+
+        running = {'now': 0, 'max': 0}
+        async def slow_upper(s):
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+            await asyncio.sleep(0.01)
+            running['now'] -= 1
+            return s.upper()
+
+        async def is_free(username):
+            await asyncio.sleep(0.01)
+            return username != 'taken'
+
+        chains = [
+            ['username', Type(str), AsyncAssert(is_free, "This username is taken.")],
+            ['first', Type(str), AsyncApply(slow_upper), Save],
+            ['last', Type(str), AsyncApply(slow_upper), Save],
+            ['tags', Optional, Each(AsyncApply(slow_upper)), Save],
+            ['full', Default(lambda d: d['first'] + ' ' + d['last'])],
+            [lambda d: d['full'], str.lower, SaveAs('slug')]
+        ]
+        schema = Schema(*chains)
+        self.assertEqual(
+            _run(schema.validate_async({'username': 'a', 'first': 'b', 'last': 'c', 'tags': ['x']})),
+            {'username': 'a', 'first': 'B', 'last': 'C', 'tags': ['X'], 'full': 'B C', 'slug': 'b c'}
+        )
+        self.assertEqual(running['max'], 3) # first, last and the tag ran concurrently
+        with self.assertRaises(ValidationError) as cm:
+            _run(schema.validate_async({'username': 'taken', 'first': 2, 'last': 'c'}, lang = 'fr'))
+        self.assertEqual(
+            cm.exception.error_details,
+            {'username': "This username is taken.", 'first': "Type incorrect. str attendu. Trouvé int."}
+        )
+        self.assertRaises(TypeError, schema.validate, {'username': 'a', 'first': 'b', 'last': 'c'})
+
+        running['max'] = 0
+        _run(Schema(*chains, max_concurrency = 1).validate_async(
+            {'username': 'a', 'first': 'b', 'last': 'c', 'tags': ['x', 'y']}
+        ))
+        self.assertEqual(running['max'], 1)
+
+        running['max'] = 0
+        _run(Schema(
+            ['a', AsyncApply(slow_upper)],
+            ['inner', Schema(['b', AsyncApply(slow_upper)], ['c', Each(AsyncApply(slow_upper))], max_concurrency = 1)]
+        ).validate_async({'a': 'x', 'inner': {'b': 'y', 'c': ['z', 't']}}))
+        self.assertEqual(running['max'], 2) # 'a', and one filter at a time in the inner schema
+
+    def test_schema_options(self):
+        from naval.aio import AsyncApply, AsyncAssert
+        calls = []
+        async def upper(s):
+            calls.append(s)
+            return s.upper()
+
+        # the options of the schemas work just like with validate
+        cached = Cached(AsyncApply(upper))
+        schema = Schema(['a', cached, Save], ['b', Discard(''), Optional, cached, Save])
+        self.assertEqual(_run(schema.validate_async({'a': 'x', 'b': 'x'})), {'a': 'X', 'b': 'X'})
+        self.assertEqual(_run(schema.validate_async({'a': 'x', 'b': ''})), {'a': 'X'})
+        self.assertEqual((calls, cached.hits), (['x'], 2))
+
+        document = {'a': 'x'}
+        unchanged = Schema(['a', AsyncAssert(upper)])
+        self.assertIs(_run(unchanged.validate_async(document)), document)
+        read_only = Schema(['a', AsyncAssert(upper)], read_only = True)
+        result = _run(read_only.validate_async(document))
+        self.assertIsInstance(result, types.MappingProxyType)
+        self.assertEqual(result, document)
+
+        fail_fast = Schema(['a', Type(int)], ['b', AsyncAssert(upper)], fail_fast = True)
+        with self.assertRaises(ValidationError) as cm:
+            _run(fail_fast.validate_async({'a': 'x', 'b': 'y', 'c': 1}))
+        self.assertEqual(list(cm.exception.error_details), ['c'])
+        with self.assertRaises(ValidationError) as cm:
+            _run(fail_fast.validate_async({'a': 'x', 'b': 'y'}))
+        self.assertEqual(list(cm.exception.error_details), ['a'])
+
+        del calls[:]
+        schema = Schema(['a', AsyncApply(upper, pure = True), Save], cache = 10)
+        for i in range(2):
+            result = _run(schema.validate_async({'a': 'y'}))
+            self.assertEqual(result, {'a': 'Y'})
+            result['a'] = 'z' # doesn't modify the cached result
+        self.assertEqual(calls, ['y'])
+
+        async def refuse(s):
+            raise ValidationError("Refused.")
+        schema = Schema(['a', AsyncApply(refuse, catch = (ValueError,))], ['b', Type(int)])
+        with self.assertRaises(ValidationError) as cm:
+            _run(schema.validate_async({'a': 'x'}))
+        self.assertEqual(cm.exception.error_details, {'a': "Refused.", 'b': "Field is missing."})
+        self.assertEqual(list(cm.exception.error_details), ['a', 'b']) # same order as validate
+
+    def test_each_max_errors(self):
+        from naval.aio import AsyncApply
+        finished = []
+        async def odd_fails(x):
+            await asyncio.sleep(0.01 * x)
+            finished.append(x)
+            if x % 2:
+                raise ValueError
+            return x
+        each = Each(AsyncApply(odd_fails, error_message = "Odd."), collect_errors = True, max_errors = 2)
+        with self.assertRaises(ValidationError) as cm:
+            _run(validate_async(each, list(range(10))))
+        self.assertEqual(cm.exception.error_details, {1: "Item #2: Odd.", 3: "Item #4: Odd."})
+        self.assertEqual(finished, [0, 1, 2, 3]) # the other items were cancelled
+        self.assertEqual(_run(validate_async(each, (0, 2))), (0, 2))
+
+    @unittest.skipIf(sys.version_info < (3, 7), "The asyncio tasks have their own context from Python 3.7.")
+    def test_settings_context(self):
+        schema = Schema(['name', Type(str)])
+        async def task(lang):
+            with settings.context(lang = lang):
+                await asyncio.sleep(0) # let the other task change its own context
+                try:
+                    schema.validate({})
+                except ValidationError as exc:
+                    return exc.error_details['name']
+        async def main():
+            return await asyncio.gather(task('fr'), task('en'))
+        self.assertEqual(_run(main()), ["Champ manquant.", "Field is missing."])
@@ -0,0 +1,4 @@
+import sys
+
+if sys.version_info >= (3, 5):
+    from naval.test.aio_cases import AsyncTest
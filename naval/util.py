@@ -1,18 +1,39 @@
-import inspect
-if not hasattr(inspect, 'getargspec'):
-    inspect.getargspec = inspect.getfullargspec
-from validators import email, domain, ValidationFailure
+import re
 from naval.core import *
 from postpone import LazyString as _
 
-__all__ = ['Email', 'Domain', 'Url']
+__all__ = ['Email', 'Domain', 'Url', 'CachedEmail', 'CachedDomain', 'CachedUrl']
+
+_validators = None
+
+def _load_validators():
+    # The validators library is imported when an email or a domain is first validated, since
+    # importing it takes longer than importing naval.
+    global _validators
+    import inspect
+    if not hasattr(inspect, 'getargspec'):
+        inspect.getargspec = inspect.getfullargspec
+    import validators
+    _validators = validators
+    return validators
+
+# The tests are module level functions rather than lambdas, so that the filters can be pickled.
+
+def _is_email(v):
+    validators = _validators or _load_validators()
+    return not isinstance(validators.email(v, whitelist = ()), validators.ValidationFailure)
+
+def _is_domain(v):
+    validators = _validators or _load_validators()
+    return (
+        not isinstance(validators.domain(v), validators.ValidationFailure)
+        and
+        not v.rsplit('.', 1)[-1].isdigit() # TLD shouldn't be all digits
+    )
 
 Email = Do(
     Type(str),
-    Assert(
-        lambda v: not isinstance(email(v, whitelist = ()), ValidationFailure),
-        error_message = _("This is not a valid email address.")
-    )
+    Assert(_is_email, error_message = _("This is not a valid email address."), pure = True, code = 'email')
 )
 
 Email.__doc__ = """
@@ -24,14 +45,7 @@ Email.__doc__ = """
 
 Domain = Do(
     Type(str),
-    Assert(
-        lambda v: (
-            not isinstance(domain(v), ValidationFailure)
-            and
-            not v.rsplit('.', 1)[-1].isdigit() # TLD shouldn't be all digits
-        ),
-        error_message = _("This is not a valid domain name.")
-    )
+    Assert(_is_domain, error_message = _("This is not a valid domain name."), pure = True, code = 'domain')
 )
 
 Domain.__doc__ = """
@@ -39,16 +53,159 @@ Domain.__doc__ = """
     This validator uses the domain name validator from the "validators" library: https://github.com/kvesteri/validators
 """
 
+# The Url filter used to be this regex, stolen from the php Spoon Library:
+# https://github.com/spoon/library/blob/master/spoon/filter/filter.php
+# Its nested quantifiers make it backtrack a lot (exponentially with the length of some
+# invalid urls), so it's replaced by the parser below, which accepts exactly the same urls.
+# The tests check that they agree.
+_URL_REGEX = (
+    r'(?:(?:https?|ftp)://)(?:\S+(?::\S*)?@)?(?:(?!10(?:\.\d{1,3}){3})(?!127(?:\.\d{1,3}){3})(?!169\.254(?:\.\d{1,3}){2})(?!192\.168(?:\.\d{1,3}){2})(?!172\.(?:1[6-9]|2\d|3[0-1])(?:\.\d{1,3}){2})(?:[1-9]\d?|1\d\d|2[01]\d|22[0-3])(?:\.(?:1?\d{1,2}|2[0-4]\d|25[0-5])){2}(?:\.(?:[1-9]\d?|1\d\d|2[0-4]\d|25[0-4]))|(?:(?:[a-z\xa1-\xff0-9]+-?)*[a-z\xa1-\xff0-9]+)(?:\.(?:[a-z\xa1}-\xff0-9]+-?)*[a-z\xa1-\xff0-9]+)*(?:\.(?:[a-z\xa1-\xff]{2,})))(?::\d{2,5})?(?:/[^\s]*)?'
+)
+
+# \d of the regex
+_isdecimal = getattr(str, 'isdecimal', str.isdigit)
+
+def _chars(*ranges):
+    return frozenset(chr(c) for first, last in ranges for c in range(ord(first), ord(last) + 1))
+
+_LETTERS = _chars(('a', 'z'), ('\xa1', '\xff'))
+_LABEL_CHARS = _LETTERS | _chars(('0', '9'))
+# The regex allows more characters in the labels after the first one: its class
+# [a-z\xa1}-\xff0-9] contains the range }-\xff.
+_OTHER_LABEL_CHARS = _LABEL_CHARS | _chars(('}', '\xff'))
+_LABEL_CHARS_HYPHEN = _LABEL_CHARS | frozenset('-')
+_OTHER_LABEL_CHARS_HYPHEN = _OTHER_LABEL_CHARS | frozenset('-')
+
+def _is_label(label, chars):
+    # (?:[chars without -]+-?)*[a-z\xa1-\xff0-9]+
+    return (
+        label != ''
+        and chars.issuperset(label)
+        and label[0] != '-'
+        and label[-1] in _LABEL_CHARS
+        and '--' not in label
+    )
+
+def _is_domain_name(host):
+    labels = host.split('.')
+    if len(labels) < 2:
+        return False
+    tld = labels.pop()
+    return (
+        len(tld) >= 2 and _LETTERS.issuperset(tld)
+        and _is_label(labels[0], _LABEL_CHARS_HYPHEN)
+        and all(_is_label(label, _OTHER_LABEL_CHARS_HYPHEN) for label in labels[1:])
+    )
+
+def _is_octet(part, first, free, top, units):
+    """
+    Tells whether `part` is a 1 to 3 digits number. A 1 or 2 digits number can start with
+    a 0 only if `first` is False. A 3 digits number starts with a 1, or with a 2 followed by
+    a digit of `free` and any digit, or by `top` and a digit of `units`.
+    """
+    if not 1 <= len(part) <= 3 or not _isdecimal(part):
+        return False
+    if len(part) < 3:
+        return not first or '1' <= part[0] <= '9'
+    return (
+        part[0] == '1'
+        or part[0] == '2' and (part[1] in free or part[1] == top and part[2] in units)
+    )
+
+def _is_public_ipv4(host):
+    parts = host.split('.')
+    if len(parts) != 4:
+        return False
+    a, b, c, d = parts
+    return (
+        _is_octet(a, True, '01', '2', '0123')
+        and _is_octet(b, False, '01234', '5', '012345')
+        and _is_octet(c, False, '01234', '5', '012345')
+        and _is_octet(d, True, '01234', '5', '01234')
+        # private and reserved ranges
+        and a not in ('10', '127')
+        and (a, b) not in (('169', '254'), ('192', '168'))
+        and not (
+            a == '172' and len(b) == 2
+            and (b[0] == '1' and b[1] in '6789' or b[0] == '2' or b[0] == '3' and b[1] in '01')
+        )
+    )
+
+def _is_port_and_path(url, start, last_space):
+    # (?::\d{2,5})?(?:/[^\s]*)? from `start` to the end of `url`
+    end = len(url)
+    if start < end and url[start] == ':':
+        digits = 0
+        while digits < 6 and start + 1 + digits < end and _isdecimal(url[start + 1 + digits]):
+            digits += 1
+        if not 2 <= digits <= 5:
+            return False
+        start += 1 + digits
+    return start == end or url[start] == '/' and last_space < start
+
+_SCHEMES = ('http://', 'https://', 'ftp://')
+
+# single characters searches, that run in linear time
+_SPACE = re.compile(r'\s')
+_HOST_END = re.compile('[:/]')
+
+def _is_url(v):
+    """
+    Tells whether `v` matches the regex _URL_REGEX, in a time proportional to its length.
+    """
+    for scheme in _SCHEMES:
+        if v.startswith(scheme):
+            break
+    else:
+        return False
+    rest = v[len(scheme):]
+    end = len(rest)
+    space = _SPACE.search(rest)
+    if space is None:
+        first_space, last_space = end, -1
+    else:
+        first_space = space.start()
+        last_space = end - 1 - _SPACE.search(rest[::-1]).start()
+    # The host starts after the scheme, or after the "@" ending the user information, and
+    # ends at the first ":" or "/" that follows. It can't contain "@".
+    at = -1
+    while True:
+        host_end = _HOST_END.search(rest, at + 1)
+        host_end = end if host_end is None else host_end.start()
+        last_at = rest.rfind('@', at + 1, host_end)
+        if last_at > 0:
+            # the user information is made of at least 1 character, and no white space
+            if last_at > first_space:
+                return False
+            at = last_at
+            continue
+        if last_at == -1:
+            host = rest[at + 1:host_end]
+            if (
+                (_is_public_ipv4(host) or _is_domain_name(host))
+                and _is_port_and_path(rest, host_end, last_space)
+            ):
+                return True
+        at = rest.find('@', host_end)
+        if at == -1 or at > first_space:
+            return False
+
 Url = Do(
     Type(str),
     Length(max=2083),
-    # regex stolen from the php Spoon Library: https://github.com/spoon/library/blob/master/spoon/filter/filter.php
-    Regex(
-        r'(?:(?:https?|ftp)://)(?:\S+(?::\S*)?@)?(?:(?!10(?:\.\d{1,3}){3})(?!127(?:\.\d{1,3}){3})(?!169\.254(?:\.\d{1,3}){2})(?!192\.168(?:\.\d{1,3}){2})(?!172\.(?:1[6-9]|2\d|3[0-1])(?:\.\d{1,3}){2})(?:[1-9]\d?|1\d\d|2[01]\d|22[0-3])(?:\.(?:1?\d{1,2}|2[0-4]\d|25[0-5])){2}(?:\.(?:[1-9]\d?|1\d\d|2[0-4]\d|25[0-4]))|(?:(?:[a-z\xa1-\xff0-9]+-?)*[a-z\xa1-\xff0-9]+)(?:\.(?:[a-z\xa1}-\xff0-9]+-?)*[a-z\xa1-\xff0-9]+)*(?:\.(?:[a-z\xa1-\xff]{2,})))(?::\d{2,5})?(?:/[^\s]*)?'
-    ),
-    error_message = _("This is not a valid url.")
+    Assert(_is_url, pure = True),
+    error_message = _("This is not a valid url."),
+    code = 'url'
 )
 Url.__doc__ = """
     Url validator.
-    The regex used is stolen from the php Spoon Library: https://github.com/spoon/library/blob/master/spoon/filter/filter.php
+    The urls accepted are the ones matched by the regex of the php Spoon Library: https://github.com/spoon/library/blob/master/spoon/filter/filter.php
+    They're recognized by a parser, in a time proportional to their length.
 """
+
+# Cached variants, for the applications that validate the same values again and again.
+# Each of them keeps the results for the 4096 most recently validated values.
+
+CachedEmail = Cached(Email, maxsize = 4096)
+CachedDomain = Cached(Domain, maxsize = 4096)
+CachedUrl = Cached(Url, maxsize = 4096)
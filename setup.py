@@ -11,7 +11,7 @@ package_data = {'naval': ['locale/naval.pot'] + locale_files + test_files}
 setup(
     name = 'naval',
     version = '1.1.0',
-    packages = ['naval'],
+    packages = ['naval', 'naval.bench'],
     package_data = package_data,
     include_package_data = True,
     install_requires = ['postpone>=0.2.0', 'validators==0.10.2', 'future'],